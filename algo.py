@@ -2,6 +2,7 @@ import heapq
 from logger import Logger
 import math
 import heapq
+from collections import deque
 
 def debugGrid(grid, pts):
     for row in grid:
@@ -262,6 +263,99 @@ def dijkstra(grid: list, start: tuple, end: tuple, diagonals=True):
 
     return None
 
+def labelRegions(blocked: list):
+    '''
+    Labels the 8-connected open regions of a grid of rows of bytes (non
+    zero is blocked)
+
+    Works on runs of open cells per row, a run is joined (union-find) with
+    the runs of the row above it touches. Returns (labels, count), labels
+    holds a region number per cell (0 for blocked cells, regions are
+    numbered from 1 in map order)
+    '''
+    parent = [0]
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    rowRuns = []
+    above = []
+    for row in blocked:
+        runs = []
+        j = 0
+        start = row.find(0)
+        while start != -1:
+            end = row.find(1, start)
+            if end == -1:
+                end = len(row)
+            run = len(parent)
+            parent.append(run)
+            # runs above touching [start-1, end] (diagonals included)
+            while j < len(above) and above[j][1] < start:
+                j += 1
+            k = j
+            while k < len(above) and above[k][0] <= end:
+                a, b = find(above[k][2]), find(run)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+                k += 1
+            runs.append((start, end, run))
+            start = row.find(0, end)
+        rowRuns.append(runs)
+        above = runs
+    # number the regions in map order
+    region = {}
+    labels = []
+    for r,runs in enumerate(rowRuns):
+        line = [0] * len(blocked[r])
+        for start, end, run in runs:
+            root = find(run)
+            if root not in region:
+                region[root] = len(region) + 1
+            line[start:end] = [region[root]] * (end-start)
+        labels.append(line)
+    return labels, len(region)
+
+def bridgePath(blocked: list, labels: list, start: tuple, target: int):
+    '''
+    Finds the path from start into the region labeled target that crosses
+    the fewest blocked cells (0-1 BFS, 8 directions), the outer border is
+    never crossed
+
+    Returns the blocked cells on the path, None if there is no path
+    '''
+    rows, cols = len(blocked), len(blocked[0])
+    dist = {start: 0}
+    prev = {}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        r, c = cell
+        if labels[r][c] == target:
+            pts = []
+            while cell in prev:
+                if blocked[cell[0]][cell[1]]:
+                    pts.append(cell)
+                cell = prev[cell]
+            pts.reverse()
+            return pts
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                nr, nc = r+dr, c+dc
+                if not (0 < nr < rows-1 and 0 < nc < cols-1):
+                    continue
+                cost = blocked[nr][nc]
+                d = dist[cell] + cost
+                if d < dist.get((nr, nc), d+1):
+                    dist[(nr, nc)] = d
+                    prev[(nr, nc)] = cell
+                    if cost:
+                        queue.append((nr, nc))
+                    else:
+                        queue.appendleft((nr, nc))
+    return None
+
 MULT = [
             [1,  0,  0, -1, -1,  0,  0,  1],
             [0,  1, -1,  0,  0, -1,  1,  0],
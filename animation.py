@@ -4,20 +4,37 @@ import time
 class Animation:
     '''
     Default animation class, used in Animator queue
+
+    Frames are sparse, each frame is a list of the cells it draws as
+    (row, col, glyph) or (row, col, glyph, color) relative to the position
     '''
-    def __init__(self, pos, frames: dict, color: Colors, delay=0.1):
+    def __init__(self, pos, frames: list, color: Colors, delay=0.1):
         self.pos = pos
         '''position of the animation relative to the map'''
         self.frames = frames
-        '''dictionary of an array of frames to display'''
+        '''list of frames to display, each a list of cells'''
         self.color = color
         '''color of the animation'''
         self.delay = delay
-        '''delay between frames (engine will sleep)'''
+        '''time between frames (seconds)'''
+        self.start = None
+        '''time the animation started playing, set by the animator'''
+
+    def frameAt(self, now):
+        '''
+        Returns the frame to show at a point in time, None once finished
+        '''
+        idx = int((now - self.start) / self.delay) if self.delay > 0 else 0
+        if idx < len(self.frames):
+            return self.frames[idx]
+        return None
 
 class Animator:
     '''
     Holds the animation queue
+
+    Animations are timed overlays, they play against the clock while the game
+    keeps running and the game draws the current frame of each on render
     '''
     _instance = None
     
@@ -31,15 +48,35 @@ class Animator:
         if not self._initialized:
             self._initialized = True
             self.AnimationQueue = []
+            self.enabled = True
+            '''set to false to drop all animations (headless, fast forward)'''
 
     def queueUp(self, animation: Animation):
         '''
-        Queue an animation object to be displayed
+        Queue an animation object to be displayed, starts playing now
         '''
+        if not self.enabled:
+            return
+        animation.start = time.perf_counter()
         self.AnimationQueue.append(animation)
+
+    def currentFrames(self, now):
+        '''
+        Returns (animation, frame) pairs to draw at a point in time and
+        drops the animations that have finished
+        '''
+        frames = []
+        playing = []
+        for animation in self.AnimationQueue:
+            frame = animation.frameAt(now)
+            if frame is not None:
+                frames.append((animation, frame))
+                playing.append(animation)
+        self.AnimationQueue = playing
+        return frames
     
     def clearQueue(self):
         '''
         Clears the animation queue
         '''
-        self.AnimationQueue = []
\ No newline at end of file
+        self.AnimationQueue = []
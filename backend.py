@@ -0,0 +1,86 @@
+import traceback
+from screen import Screen
+from logger import LogWriter
+
+class Backend:
+    '''
+    Base class for display backends used by the game
+
+    A backend receives a packed screen buffer to display and hands
+    back input events, child classes decide where the frame ends up
+    '''
+    def __init__(self, debug=False):
+        self.ErrorLog = 'ErrorLog.log'
+        '''where to dump errors'''
+        self.EventLog = 'EventLog.log'
+        '''where to dump events'''
+        self.FrameDelay = 1
+        '''optional delay between frames'''
+        self.Frames = 0
+        '''current frame counter'''
+        self.Initialized = False
+        '''keeps track of object initialization of the backend'''
+        self.debug = debug
+        '''logs more messages if true'''
+
+    def init(self, stdscr=None, timeDelay: int=None):
+        '''
+        Required to call at startup, returns size of the display
+        '''
+        raise NotImplementedError
+
+    def frameReady(self):
+        '''
+        Decrement frame counter and return if backend is ready to display
+        '''
+        self.Frames -= 1
+        if self.Frames <= 0:
+            self.Frames = self.FrameDelay
+            return True
+        return False
+
+    def output(self, screen: Screen):
+        '''
+        Call to output a packed screen buffer
+        '''
+        raise NotImplementedError
+
+    def readInput(self):
+        '''
+        Call to grab input and return a valid event in string form
+        '''
+        raise NotImplementedError
+
+    def pause(self, t=1):
+        '''
+        Waits t amount of seconds between frames
+        '''
+        raise NotImplementedError
+
+    def cursorPosition(self, pos):
+        '''
+        Moves the cursor to a position
+        '''
+        pass
+
+    def clearLogs(self):
+        '''
+        Empties the error and event logs
+        '''
+        LogWriter().flush()
+        with open(self.ErrorLog, 'w+') as el:
+            el.write('')
+        with open(self.EventLog, 'w+') as el:
+            el.write('')
+
+    def logEvent(self, msg):
+        '''
+        Logs an event to the event log
+        '''
+        LogWriter().write(self.EventLog, f'{msg}\n')
+
+    def logError(self, msg=''):
+        '''
+        Logs an error to the error log
+        '''
+        LogWriter().write(self.ErrorLog, f'{traceback.format_exc()}{msg}\n')
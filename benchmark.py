@@ -0,0 +1,281 @@
+import time
+import json
+import random
+import statistics
+import tracemalloc
+from engine import Engine
+from colors import Colors
+from screen import Screen
+from game import Game
+from headless import HeadlessEngine
+from entity import Layer
+from monster import Jelly, Newt
+from algo import astar, dijkstra, RecursiveShadow
+
+class StubWindow:
+    '''
+    Stand in for a curses window, counts the calls made to it
+    '''
+    def __init__(self, rows=24, cols=80):
+        self.rows = rows
+        '''Total height of the fake terminal'''
+        self.cols = cols
+        '''Total width of the fake terminal'''
+        self.calls = 0
+        '''Number of write calls received'''
+
+    def getmaxyx(self):
+        return self.rows, self.cols
+
+    def addch(self, r, c, ch, attr=0):
+        self.calls += 1
+
+    def addstr(self, r, c, s, attr=0):
+        self.calls += 1
+
+    def addnstr(self, r, c, s, n, attr=0):
+        self.calls += 1
+
+    def erase(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def getch(self):
+        return -1
+
+def stubEngine(rows=24, cols=80):
+    '''
+    Returns an engine that outputs to a stub window instead of curses
+    '''
+    Colors(display=False)
+    engine = Engine()
+    engine.stdscr = StubWindow(rows, cols)
+    engine.termrows, engine.termcols = rows, cols
+    engine.Colors = Colors()
+    engine.Initialized = True
+    return engine
+
+def perCellOutput(engine: Engine, screen: Screen):
+    '''
+    Reference output that writes every cell with its own addch call
+    '''
+    for r in range(screen.rows):
+        for c in range(screen.cols):
+            engine.stdscr.addch(r, c, screen.glyph(r, c), screen.color(r, c))
+    engine.stdscr.refresh()
+
+def testFrame(rows, cols, shift=0):
+    '''
+    Builds a map-like frame with a few color changes per row
+    '''
+    screen = Screen(rows, cols, color=1)
+    for r in range(rows):
+        for c in range(cols):
+            screen.set(r, c, '.' if (r+c+shift) % 7 else '#',
+                       1 if (c+shift) % 20 < 15 else 2)
+    return screen
+
+def benchmarkOutput(frames=500, rows=24, cols=80):
+    '''
+    Measures frames per second of the engine output against a stub window
+
+    Compares per cell writes, span writes with a full repaint every frame,
+    and span writes of only the changed cells (one moving glyph)
+    '''
+    results = {}
+    screen = testFrame(rows-1, cols-1)
+    other = testFrame(rows-1, cols-1, shift=1)
+
+    engine = stubEngine(rows, cols)
+    t = time.perf_counter()
+    for _ in range(frames):
+        perCellOutput(engine, screen)
+    results['per cell'] = (time.perf_counter()-t, engine.stdscr.calls)
+
+    engine = stubEngine(rows, cols)
+    t = time.perf_counter()
+    for f in range(frames):
+        engine.repaint()
+        engine.output(other if f % 2 else screen)
+    results['span repaint'] = (time.perf_counter()-t, engine.stdscr.calls)
+
+    engine = stubEngine(rows, cols)
+    t = time.perf_counter()
+    for f in range(frames):
+        r, c = f % (rows-1), f % (cols-1)
+        saved = screen.snapshot()
+        screen.setGlyph(r, c, '@')
+        engine.output(screen)
+        screen.restore(saved)
+    results['span diff'] = (time.perf_counter()-t, engine.stdscr.calls)
+
+    for name, (total, calls) in results.items():
+        print(f'{name}')
+        print(f'  FPS:   {frames/total:.1f}')
+        print(f'  Calls: {calls/frames:.1f} (per frame)')
+    return results
+
+BENCH_SIZES = [(10,20), (20,40), (40,80)]
+'''Map sizes (rows, cols) run by the benchmark suite'''
+BENCH_DENSITIES = [3, 10]
+'''Monster chances (percent) run by the benchmark suite'''
+BENCH_ACTIONS = ['1','2','3','4','6','7','8','9','<','t','t6']
+'''Player actions drawn by the benchmark turns'''
+MAP_ORIGIN = (4,4)
+'''Screen position of the map, as set by Game.gameSetup'''
+
+def timeMethod(obj, name, samples: list):
+    '''
+    Wraps a method of an object so every call appends its duration
+    '''
+    method = getattr(obj, name)
+    def timed(*args, **kwargs):
+        t = time.perf_counter()
+        result = method(*args, **kwargs)
+        samples.append(time.perf_counter()-t)
+        return result
+    setattr(obj, name, timed)
+
+def summarize(samples: list):
+    '''
+    Returns the statistics of a list of durations
+    '''
+    return {
+        'count': len(samples),
+        'median': statistics.median(samples) if samples else 0.0,
+        'min': min(samples) if samples else 0.0,
+        'total': sum(samples)
+    }
+
+def headlessGame(seed, size, density):
+    '''
+    Returns a headless game set up for a map size and monster density
+
+    The virtual screen fits the map at its origin and the menus, so every
+    map cell is drawn
+    '''
+    rows = max(24, size[0]+MAP_ORIGIN[0]+1)
+    cols = max(80, size[1]+MAP_ORIGIN[1]+1)
+    game = Game(specificSeed=seed, display=False,
+                backend=HeadlessEngine(rows, cols))
+    # the game turns logging back on when built, it would dominate the
+    # measurements
+    game.Logger.debugOn = False
+    game.mapHeight, game.mapWidth = size
+    game.monsterChance = density
+    game.noDisplaySetup()
+    return game
+
+def benchmarkCase(seed, size, density, turns=100, setups=5, repeats=20):
+    '''
+    Times the game setup, the turn loop parts and the map algorithms for one
+    map size and monster density, everything is driven by the seed
+    '''
+    samples = {name: [] for name in ['gameSetup', 'updateCurrentLevel',
+                                     'setupPlayerFOV', 'LayersToScreen',
+                                     'astar', 'dijkstra', 'RecursiveShadow']}
+    for _ in range(setups):
+        game = headlessGame(seed, size, density)
+        timeMethod(game, 'gameSetup', samples['gameSetup'])
+        game.gameSetup()
+
+    # play turns with a seeded action sequence
+    game = headlessGame(seed, size, density)
+    timeMethod(game, 'LayersToScreen', samples['LayersToScreen'])
+    rng = random.Random(seed)
+    played = 0
+    while played < turns:
+        game.gameSetup()
+        manager = game.LevelManager
+        timeMethod(manager, 'updateCurrentLevel', samples['updateCurrentLevel'])
+        timeMethod(manager, 'setupPlayerFOV', samples['setupPlayerFOV'])
+        while played < turns and manager.Player.Health.alive:
+            game.loop(rng.choice(BENCH_ACTIONS), 1)
+            game.messages()
+            game.prepareBuffers()
+            played += 1
+
+    # map algorithms on the first level of the last game
+    level = manager.Levels[0]
+    layers = level.EntityLayer.Layers
+    blocked = level.EntityLayer.Opaque
+    # path from the player start to the open space furthest down the map
+    start = (1,1)
+    end = max([(r,c) for r,row in enumerate(blocked)
+                for c,b in enumerate(row) if not b])
+    for _ in range(repeats):
+        t = time.perf_counter()
+        astar(blocked, start, end)
+        samples['astar'].append(time.perf_counter()-t)
+        t = time.perf_counter()
+        dijkstra(layers, start, end, diagonals=False)
+        samples['dijkstra'].append(time.perf_counter()-t)
+        t = time.perf_counter()
+        RecursiveShadow(layers, start, 8, int(Layer.MONST_LAYER))
+        samples['RecursiveShadow'].append(time.perf_counter()-t)
+    return {name: summarize(times) for name, times in samples.items()}
+
+def runSuite(seed=1, sizes=BENCH_SIZES, densities=BENCH_DENSITIES, turns=100,
+             output='benchmark.json'):
+    '''
+    Runs every map size and monster density and writes the results as JSON
+    '''
+    results = {}
+    for size in sizes:
+        for density in densities:
+            case = f'{size[0]}x{size[1]} monsters:{density}'
+            results[case] = benchmarkCase(seed, size, density, turns=turns)
+            print(case)
+            for name, stats in results[case].items():
+                print(f'  {name:20} {stats["median"]*1000:9.3f} ms')
+    with open(output, 'w+') as f:
+        json.dump({'seed': seed, 'turns': turns, 'results': results}, f,
+                  indent=2)
+    return results
+
+def compareBaseline(results: dict, baselineFile: str, threshold=0.2,
+                    minimum=0.0001):
+    '''
+    Compares median times to a baseline JSON file written by runSuite
+
+    Returns a list of regressions, measurements more than threshold
+    (fraction) slower than the baseline, slowdowns under minimum seconds are
+    treated as noise
+    '''
+    with open(baselineFile, 'r') as f:
+        baseline = json.load(f)['results']
+    regressions = []
+    for case, metrics in results.items():
+        for name, stats in metrics.items():
+            if case not in baseline or name not in baseline[case]:
+                continue
+            old = baseline[case][name]['median']
+            new = stats['median']
+            if new - old > minimum and new > old * (1 + threshold):
+                regressions.append((case, name, old, new))
+    for case, name, old, new in regressions:
+        print(f'REGRESSION {case} {name}: {old*1000:.3f} ms -> '
+              f'{new*1000:.3f} ms ({new/old-1:+.0%})')
+    return regressions
+
+def benchmarkMemory(count=100000):
+    '''
+    Measures the memory taken by spawning monsters (half Jellies, half Newts)
+
+    Returns the average bytes per monster
+    '''
+    Colors(display=False)
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    monsters = [Jelly() if i % 2 else Newt() for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    print(f'{len(monsters)} monsters: {used/2**20:.1f} MiB '
+          f'({used/count:.0f} bytes each)')
+    return used / count
+
+if __name__ == '__main__':
+    benchmarkOutput()
+    benchmarkMemory()
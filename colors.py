@@ -1,5 +1,3 @@
-import curses
-
 class Colors:
     '''
     Colors class sets up the colors for the curses interface
@@ -31,17 +29,20 @@ class Colors:
                 'yellow_bg'
             ]
             if display:
+                import curses
                 self.cursesColors()
                 for idx,color in enumerate(colors):
                     setattr(self, color, curses.color_pair(idx+1))
             else:
+                # without curses the color pair number is used as the id
                 for idx,color in enumerate(colors):
-                    setattr(self, color, None)
+                    setattr(self, color, idx+1)
 
     def cursesColors(self):
         '''
         Create the color pairs for the curses module
         '''
+        import curses
         curses.init_pair(1, curses.COLOR_BLACK, curses.COLOR_BLACK)
         curses.init_pair(2, curses.COLOR_RED, curses.COLOR_BLACK)
         curses.init_pair(3, curses.COLOR_GREEN, curses.COLOR_BLACK)
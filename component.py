@@ -1,4 +1,5 @@
 from logger import Logger
+from profiler import Profiler
 import math
 from enum import Enum
 from algo import RecursiveShadow
@@ -16,9 +17,13 @@ class Charge:
     '''
     Charge component, if an entity can run and charge
     '''
+    __slots__ = ('charging', 'direction', 'distance', 'frameSpeed')
+
     def __init__(self):
         self.charging = False
         '''If entity is currently charging'''
+        self.direction = 0
+        '''Movement key of the charge'''
         self.distance = 0
         '''Distance covered by charge - for damage'''
         self.frameSpeed = 0.005
@@ -39,6 +44,8 @@ class Activate:
     '''
     Activate component, if an entity does something upon a trigger
     '''
+    __slots__ = ('active',)
+
     def __init__(self, startingState):
         self.active = startingState
         '''State of the entity'''
@@ -51,11 +58,15 @@ class Brain:
     '''
     Brain component, if an entity needs to make decisions
     '''
+    __slots__ = ('sightRange', 'blockingLayer', 'Profiler')
+
     def __init__(self, sightRange, blockingLayer):
         self.sightRange = sightRange
         '''How far FOV will check'''
         self.blockingLayer = blockingLayer
         '''Highest level (exclusive) FOV will see through'''
+        self.Profiler = Profiler()
+        '''Span profiler'''
 
     def input(self, myPos, myZ, playerPos, playerZ, entityLayer):
         '''Returns an action'''
@@ -91,18 +102,20 @@ class Brain:
     
     def getFOVFromEntityLayer(self, entityLayer, currPos):
         '''Use FOV algorithm to get which points are visible'''
-        grid = [[max([int(x.layer) for x in entityLayer[r][c]])
-                 for c in range(len(entityLayer[r]))]
-                    for r in range(len(entityLayer))]
-        return RecursiveShadow(grid,
-                               currPos,
-                               self.sightRange,
-                               int(self.blockingLayer))
+        self.Profiler.start('FOV')
+        pts = RecursiveShadow(entityLayer.Layers,
+                              currPos,
+                              self.sightRange,
+                              int(self.blockingLayer))
+        self.Profiler.end()
+        return pts
 
 class Health:
     '''
     Health component, if an entity needs a health bar
     '''
+    __slots__ = ('maxHealth', 'currentHealth', 'alive')
+
     def __init__(self, health):
         self.maxHealth = health
         '''Maximum for the health bar'''
@@ -135,6 +148,8 @@ class Attack:
     '''
     Attack component, if an entity can deal damage
     '''
+    __slots__ = ('name', 'damage', 'alignment')
+
     def __init__(self, name, damage, alignment: Alignment):
         self.name = name
         '''name of the attack'''
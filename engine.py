@@ -1,40 +1,25 @@
 import curses
-import traceback
 import time
 from colors import Colors
+from backend import Backend
+from screen import Screen, GLYPH_MASK, COLOR_SHIFT
+from array import array
 
-class Engine:
+class Engine(Backend):
     '''
     Engine class provides a curses interface displayer
-    Pass any 2D character buffer and display it with colors
+    Pass a packed screen buffer and display it with colors
     '''
     def __init__(self, debug=False):
+        super().__init__(debug=debug)
         self.inputTimeout = 1
         '''optional ms between engine display'''
         self.stdscr = None
         '''curses.window'''
-        self.ErrorLog = 'ErrorLog.log'
-        '''where to dump errors'''
-        self.EventLog = 'EventLog.log'
-        '''where to dump events'''
-        self.FrameDelay = 1
-        '''optional delay between frames'''
-        self.Frames = 0
-        '''current frame counter'''
-        self.Initialized = False
-        '''keeps track of object initialization of the curses module'''
-        self.debug = debug
-        '''logs more messages if true'''
-
-    def frameReady(self):
-        '''
-        Decrement frame counter and return if engine is ready to display
-        '''
-        self.Frames -= 1
-        if self.Frames <= 0:
-            self.Frames = self.FrameDelay
-            return True
-        return False
+        self.lastFrame = None
+        '''packed cells of the last frame sent to the terminal'''
+        self.lastPalette = None
+        '''palette the last frame was packed with'''
 
     def init(self, stdscr: curses.window, timeDelay: int=None):
         '''
@@ -50,33 +35,85 @@ class Engine:
         if timeDelay:
             self.FrameDelay = timeDelay
         # clear logs
-        with open(self.ErrorLog, 'w+') as el:
-            el.write('')
-        with open(self.EventLog, 'w+') as el:
-            el.write('')
+        self.clearLogs()
         self.Initialized = True
         self.logEvent(f'Engine initialized {(self.termrows,self.termcols)}')
         self.logEvent(f'  Frame Delay: {self.FrameDelay}')
         return self.termrows, self.termcols
 
-    def output(self, screenChars: list=[], screenColors: list=[]):
+    def output(self, screen: Screen):
         '''
-        Call to output a 2D character buffer and an optional 2D curses
-        color pair buffer to the terminal
+        Call to output a packed screen buffer to the terminal
+
+        Only cells that changed since the last frame are written, a resized
+        terminal forces a full repaint
+
+        Consecutive changed cells of the same color are written as one span
         '''
         if not self.Initialized:
             return
+        r, c = 0, 0
         try:
-            for r,row in enumerate(screenChars):
-                for c,chr in enumerate(row):
-                    if r < len(screenColors) and c < len(screenColors[r]):
-                        color = screenColors[r][c]
-                    else:
-                        color = self.Colors.white
-                    self.stdscr.addch(r, c, chr, color)
+            if (self.checkResize() or self.lastFrame is None or
+                screen.Palette is not self.lastPalette):
+                # packed values are only comparable within one palette
+                self.repaint()
+            data = screen.data
+            last = self.lastFrame
+            full = len(last) != len(data)
+            cols = screen.cols
+            for r in screen.changedRows(last):
+                base = r*cols
+                row = data[base:base+cols]
+                start = -1
+                spanColor = None
+                for c,value in enumerate(row):
+                    color = value >> COLOR_SHIFT
+                    changed = full or value != last[base+c]
+                    if start >= 0 and (not changed or color != spanColor):
+                        # span ended on an unchanged cell or a new color
+                        self.writeSpan(screen, r, start, row[start:c])
+                        start = -1
+                    if changed and start < 0:
+                        start = c
+                        spanColor = color
+                if start >= 0:
+                    c = cols
+                    self.writeSpan(screen, r, start, row[start:])
+            self.lastFrame = screen.snapshot()
+            self.lastPalette = screen.Palette
             self.stdscr.refresh()
         except Exception as e:
+            self.repaint()
             self.logError(f'Display ERROR: [{c},{r}]: {e}')
+
+    def writeSpan(self, screen: Screen, r, c, values):
+        '''
+        Writes a run of packed cells sharing one color with a single call
+        '''
+        glyphs = screen.Palette.glyphs
+        chars = ''.join([glyphs[v & GLYPH_MASK] for v in values])
+        color = screen.Palette.colors[values[0] >> COLOR_SHIFT]
+        self.stdscr.addnstr(r, c, chars, len(chars), color)
+
+    def repaint(self):
+        '''
+        Forget the last frame so the next output redraws every cell
+        '''
+        self.lastFrame = array('I')
+        if self.stdscr:
+            self.stdscr.erase()
+
+    def checkResize(self):
+        '''
+        Returns true if the terminal size changed since the last check
+        '''
+        rows, cols = self.stdscr.getmaxyx()
+        if (rows, cols) != (self.termrows, self.termcols):
+            self.termrows, self.termcols = rows, cols
+            self.logEvent(f'Terminal resized {(rows,cols)}')
+            return True
+        return False
     
     def readInput(self):
         '''
@@ -93,21 +130,6 @@ class Engine:
         except Exception as e:
             self.logError(f'Read input ERROR: {event}')
     
-    def logEvent(self, msg):
-        '''
-        Logs an event to the event log
-        '''
-        with open(self.EventLog, 'a+') as lf:
-            lf.write(f'{msg}\n')
-
-    def logError(self, msg=''):
-        '''
-        Logs an engine error to the error log
-        '''
-        with open(self.ErrorLog, 'a+') as lf:
-            lf.write(f'{traceback.format_exc()}')
-            lf.write(f'{msg}\n')
-
     def cursorPosition(self, pos):
         '''
         Moves the cursor to a position
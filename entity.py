@@ -1,5 +1,6 @@
 from colors import Colors
-from logger import Logger
+from logger import Logger, LogLevel
+from profiler import Profiler
 from menu import Messager
 import itertools
 from component import *
@@ -39,10 +40,22 @@ class Size(IntEnum):
     GIANT = 6,
     HUMONGOUS = 7
 
+NORMAL_SPEED = 100
+'''Speed of an entity acting once per normal turn'''
+TURN_TIME = 100
+'''Simulated time taken by an action at normal speed'''
+
 class Entity:
     '''
     Base entity class for all objects
+
+    Entities use slots, child classes must declare their own (empty if they
+    add no attributes). Components are always present, None if the entity
+    does not have them.
     '''
+    __slots__ = ('id', 'name', 'glyph', 'color', 'pos', 'layer', 'z',
+                 'Messager', 'isActive', 'EntityLayerPos', 'turn', 'size',
+                 'speed', 'Logger', 'Health', 'Attack', 'Brain', 'Charge', 'Activate')
     _id_gen = itertools.count(1)
     '''Shared ID generator'''
     def __init__(self, name: str, glyph: str, color: Colors, layer: Layer,
@@ -65,21 +78,39 @@ class Entity:
         '''Connection to message queue'''
         self.isActive = True
         '''If false, level manager will remove the entity from the game'''
-        self.EntityLayerPos = [-1, -1, -1]
-        '''Coordinates (xyz) in the Entity Layer, set by level manager'''
+        self.EntityLayerPos = [-1, -1]
+        '''Cell (row, col) holding the entity in the Entity Layer, set by the
+        level, [-1,-1] while the entity is not on a level'''
         self.turn = 0
         '''Keeps track of game turns'''
         self.size = size
         '''Size enum for the entity'''
+        self.speed = NORMAL_SPEED
+        '''Actions per turn relative to NORMAL_SPEED (200 acts twice)'''
         self.Logger = Logger()
+        self.Health = None
+        '''Health component'''
+        self.Attack = None
+        '''Attack component'''
+        self.Brain = None
+        '''Brain component'''
+        self.Charge = None
+        '''Charge component'''
+        self.Activate = None
+        '''Activate component'''
 
-    def setPosition(self, pos: list, zlevel: int, idx: int):
+    def setPosition(self, pos: list, zlevel: int):
         '''
         Sets the position of the entity
         '''
         self.pos = pos
         self.z = zlevel
-        self.EntityLayerPos = [pos[0], pos[1], idx]
+
+    def actionTime(self):
+        '''
+        Returns the simulated time one action of the entity takes
+        '''
+        return TURN_TIME * NORMAL_SPEED // self.speed
 
     def death(self, *args):
         '''
@@ -97,7 +128,7 @@ class Entity:
     
     def handleCharging(self, state, direction=None, entityLayer=[]):
         '''Checks if an entity can charge and is charging'''
-        if hasattr(self, 'Charge'):
+        if self.Charge is not None:
             if self.Charge.charging:
                 if state == 'move':
                     self.Charge.distance += 1
@@ -107,19 +138,19 @@ class Entity:
                     return self.Charge.end()
             elif state == 'start':
                 self.Charge.start(int(direction))
-                self.movement(self.Charge.direction, entityLayer)
+                return self.movement(self.Charge.direction, entityLayer)
 
     def move(self, row: int, col: int, entityLayer: list):
         '''
-        Moves the entity by a certain delta, checks the layers for validity
+        Moves the entity by a certain delta, checks the blocking grid for
+        validity
 
         If an entity is charging, it will increment the distance
 
         If an entity is charging and the position is invalid, it will end the
         charge
         '''
-        maxLayer = max([x.layer for x in entityLayer[row][col]])
-        if self.layer > maxLayer:
+        if not entityLayer.Blocking[row][col]:
             self.pos[0] = row
             self.pos[1] = col
             self.handleCharging('move')
@@ -155,7 +186,7 @@ class Entity:
         '''
         entities = []
         for entity in entityLayer[self.pos[0]][self.pos[1]]:
-            if entity is not self and hasattr(entity, 'Activate'):
+            if entity is not self and entity.Activate is not None:
                 entity.Activate.trigger()
                 entities.append(entity)
         return entities
@@ -189,7 +220,7 @@ class Entity:
         Returns True if there was an attack, and the entity that was killed
         '''
         for entity in entityLayer[row][col]:
-            if hasattr(self, 'Attack') and self.attackable(entity):
+            if self.Attack is not None and self.attackable(entity):
                 chargeDmg = self.handleCharging('damage')
                 if chargeDmg:
                     damage = chargeDmg
@@ -214,7 +245,8 @@ class Entity:
         Returns the entity if it was killed
         '''
         damage = damage * -1
-        self.Logger.log(f'{self.name} dealing {damage} to {entity.name}')
+        self.Logger.log('%s dealing %s to %s', self.name, damage, entity.name)
+        entityLayer.disturb(entity)
         if entity.Health.changeHealth(damage):
             self.Messager.addKillMessage(self.name, entity.name)
             entity.remove(entityLayer)
@@ -225,7 +257,7 @@ class Entity:
     def attackable(self, entity):
         '''Checks if an entity can be attacked'''
         if (entity is not self and 
-            hasattr(entity, 'Health')):
+            entity.Health is not None):
             return True
         return False
     
@@ -267,29 +299,29 @@ class Entity:
             objr, objc = self.pos[0], self.pos[1]
             while True:
                 r,c = objr + direction[0], objc + direction[1]
-                maxLayer = max([x.layer for x in entityLayer[r][c]])
+                maxLayer = entityLayer.Layers[r][c]
                 if maxLayer == Layer.MONST_LAYER:
                     objr, objc = r, c
                     break
                 elif maxLayer == Layer.WALL_LAYER:
                     break
                 objr, objc = r, c
-            entity.setPosition(pos=[objr,objc], zlevel=self.z, idx=-1)
+            entity.setPosition(pos=[objr,objc], zlevel=self.z)
         elif target:
             # set the known position
-            entity.setPosition(pos=target, zlevel=self.z, idx=-1)
+            entity.setPosition(pos=target, zlevel=self.z)
         else:
-            self.Logger.log(f'Error: invalid throw')
+            self.Logger.log('Error: invalid throw', level=LogLevel.ERROR)
             return
         
-        # construct a grid of 1,0 (makes sure path to end point is valid)
-        grid = [[1 if max([int(x.layer) for x in elist])
-                 > Layer.MONST_LAYER else 0
-                 for elist in row]
-                 for row in entityLayer]
-        code, pts = astar(grid, tuple(self.pos), tuple(entity.pos))
+        # walls stop the throw (makes sure path to end point is valid)
+        Profiler().start('Pathfinding')
+        code, pts = astar(entityLayer.Opaque, tuple(self.pos),
+                          tuple(entity.pos))
+        Profiler().end()
         if code != 1:
-            self.Logger.log(f'Error: failed to throw -> {code}')
+            self.Logger.log('Error: failed to throw -> %s', code,
+                            level=LogLevel.ERROR)
             return
 
         # deal damage
@@ -303,15 +335,13 @@ class Entity:
                     entities.append(kill)
 
         # create the animation
-        frames = {}
-        for idx,pt in enumerate(pts):
-            frames[str(idx)] = [['' for col in row] for row in grid]
-            frames[str(idx)][pt[0]][pt[1]] = entity.glyph
-        apos = [0,0]
-        delay = 0.05
-        animation = Animation(apos, frames, entity.color, delay=delay)
         animator = Animator()
-        animator.queueUp(animation)
+        if animator.enabled:
+            frames = [[(pt[0], pt[1], entity.glyph)] for pt in pts]
+            apos = [0,0]
+            delay = 0.05
+            animation = Animation(apos, frames, entity.color, delay=delay)
+            animator.queueUp(animation)
         # return the thrown entity
         elist = [entity]
         if entities:
@@ -323,7 +353,7 @@ class Entity:
         '''
         Entrance for entity actions
         '''
-        if hasattr(self, 'Charge') and self.Charge.charging:
+        if self.Charge is not None and self.Charge.charging:
             # override all other events and keep charging
             return self.movement(self.Charge.direction, entityLayer)
         elif event[0] == '5' and len(event) > 1:
@@ -1,18 +1,23 @@
 from game import Game
-import curses
 from geneticBot import GeneticBot, GeneticManager
 from menu import GameState
 
 class Environment:
-    def __init__(self, seed=None, display=True):
+    def __init__(self, seed=None, display=True, profile=False, seedBank=None):
         '''
         Initializes the environment
         '''
         self.Game = Game(
-            seed=seed,
-            msgBlocking=False
+            specificSeed=seed,
+            msgBlocking=False,
+            display=display,
+            profile=profile
         )
         '''game object'''
+        self.Game.SeedBank = seedBank
+        if self.Game.Sampler:
+            # profile the whole step, not only the game loop
+            self.Game.Sampler.addRoot(Environment.step)
         self.ActionDelay = 10
         '''max amount of time to wait between bot actions'''
         self.Delay = self.ActionDelay
@@ -26,11 +31,12 @@ class Environment:
         self.state = None
         # if using the display, start the curses module
         if self.Display:
+            import curses
             curses.wrapper(self.start)
         else:
             self.start()
 
-    def start(self, stdscr: curses.window=None):
+    def start(self, stdscr: 'curses.window'=None):
         '''
         Environment start calls the game initialization and runs the 
         environment loop instead of the game loop
@@ -44,6 +50,7 @@ class Environment:
         self.Game.gameSetup()
         # use the environment main loop instead of the game main loop
         self.main()
+        self.Game.end()
 
     def main(self):
         '''
@@ -81,12 +88,19 @@ class Environment:
         '''
         Takes one step in the environment
         '''
-        self.Game.loop(action)
+        if self.Game.Sampler:
+            self.Game.Sampler.beginTurn(self.Game.MenuManager.TurnMenu.count+1)
+        energy, event = self.Game.getEnergy(action)
+        if energy == 0:
+            self.Game.clearState()
+        elif energy > 0:
+            self.Game.loop(event, energy)
         self.Game.messages()
-        if self.Display:
-            self.Game.prepareBuffers()
-            self.Game.render()
-            self.Game.animations()
+        # headless games still draw into the backend frame
+        self.Game.prepareBuffers()
+        self.Game.render()
+        if self.Game.Sampler:
+            self.Game.Sampler.endTurn()
 
     def render(self):
         '''
@@ -1,29 +1,46 @@
-import curses
-import random
-from curses import ascii
-from engine import Engine
-from level import LevelManager
+from headless import HeadlessEngine
+from backend import Backend
+from level import LevelManager, generationPool
 from colors import Colors
-from logger import Logger, Timing
+from screen import Screen
+from animation import Animator
+import time
+from logger import Logger, LogLevel
+from profiler import Profiler, StackSampler
 from menu import MenuManager, GameState, Messager
 import secrets
 
+MAP_HEIGHT = 10
+'''Default total height (rows) of each level'''
+MAP_WIDTH = 20
+'''Default total width (cols) of each level'''
+TOTAL_LEVELS = 3
+'''Default number of levels in the dungeon'''
+MONSTER_CHANCE = 3
+'''Default percent chance (exclusive) of a monster on each floor space'''
+
 class Game:
     '''
     Game class controls the entire game execution from start to finish
     '''
     def __init__(self, specificSeed=None, msgBlocking=True, display=True,
-                 timing=False):
-        self.Engine = Engine(debug=False)
-        '''Connection to engine for displaying and events'''
+                 timing=False, backend: Backend=None, profile=False):
+        if backend is None:
+            if display:
+                # curses is only loaded when there is a display
+                from engine import Engine
+                backend = Engine(debug=False)
+            else:
+                backend = HeadlessEngine()
+        self.Engine = backend
+        '''Connection to engine (display backend) for displaying and events'''
         self.running = False
         '''If the game is running'''
         self.LevelManager = None
         '''Controls objects in each level'''
         self.ScreenBuffer = None
-        '''2D buffer the size of the terminal for outputting to engine'''
-        self.ColorBuffer = None
-        '''2D buffer the size of the terminal for outputting to engine'''
+        '''Packed glyph and color buffer the size of the terminal for
+        outputting to engine'''
         self.CreatureLayer = None
         '''2D buffer the size of the map, holds all moving entities'''
         self.MenuManager = None
@@ -46,23 +63,47 @@ class Game:
         '''Set when recreating a seed'''
         self.previousEvent = ''
         '''Used for key motions of multiple characters'''
-        self.Timing = Timing()
-        '''Timing for measurements'''
+        self.redrawAll = True
+        '''Recompose every map cell on the next frame instead of dirty ones'''
+        self.mapHeight = MAP_HEIGHT
+        '''Total height (rows) of each level'''
+        self.mapWidth = MAP_WIDTH
+        '''Total width (cols) of each level'''
+        self.totalLevels = TOTAL_LEVELS
+        '''How many levels the dungeon has'''
+        self.monsterChance = MONSTER_CHANCE
+        '''Percent chance (exclusive) of a monster on each open floor space'''
+        self.SeedBank = None
+        '''Pre-generated levels used on setup for the seeds they hold'''
+        self.generationWorkers = 0
+        '''Processes generating all levels at setup, 0 generates each level
+        when it is first entered'''
+        self.GenerationPool = None
+        '''Worker processes generating levels, started on the first setup
+        and kept until the game ends'''
+        self.Profiler = Profiler()
+        '''Span profiler for timing measurements'''
+        self.Animator = Animator()
+        '''Plays animations as overlays on render'''
+        # animations only exist to be seen, skip them without a display
+        self.Animator.enabled = display
         self.Logger = Logger()
         # turn off logging for timing measurements
         self.Logger.debugOn = not timing
-        self.Timing.allowTiming = timing
+        self.Profiler.enabled = timing
+        self.Sampler = None
+        '''Samples the call stack during turns when profiling'''
+        if profile:
+            self.Sampler = StackSampler(roots=[Game.loop])
+            self.Sampler.start()
 
-    def displaySetup(self, stdscr: curses.window, timeDelay: int=None):
+    def displaySetup(self, stdscr: 'curses.window', timeDelay: int=None):
         '''
         Sets up the display for outputting to the screen
         '''
         # initialize engine
         self.termRows, self.termCols = self.Engine.init(stdscr, timeDelay)
-        self.ScreenBuffer = [[' ' for _ in range(self.termCols-1)] 
-                                    for _ in range(self.termRows-1)]
-        self.ColorBuffer = [[Colors().white for _ in range(self.termCols-1)] 
-                                    for _ in range(self.termRows-1)]
+        self.bufferSetup()
 
     def noDisplaySetup(self):
         '''
@@ -70,41 +111,68 @@ class Game:
         '''
         # need to initialize Colors without curses module
         Colors(display=False)
+        self.termRows, self.termCols = self.Engine.init()
+        self.bufferSetup()
+
+    def bufferSetup(self):
+        '''
+        Creates the packed screen buffer the size of the display
+        '''
+        self.ScreenBuffer = Screen(self.termRows-1, self.termCols-1,
+                                   color=Colors().white)
     
     def gameSetup(self):
         '''
         Sets up the game from a fresh start
         '''
-        self.Timing.start('Game Setup')
+        self.Profiler.start('Game Setup')
         # start running
         self.running = True
         # set up objects
-        if self.specificSeed is None:
-            self.seed = secrets.randbits(64)
-        else:
+        startPos = [1,1]
+        bank = self.SeedBank
+        if bank is not None and not bank.matches(self.mapHeight, self.mapWidth,
+                                                 self.totalLevels,
+                                                 self.monsterChance, startPos):
+            self.Logger.log('Seed bank %s does not match the game settings',
+                            bank.path, level=LogLevel.WARNING)
+            bank = None
+        if self.specificSeed is not None:
             self.seed = self.specificSeed
-        self.RNG = random.Random(self.seed)
-        self.Logger.log(f'SEED: {self.seed}')
+        elif bank is not None:
+            self.seed = bank.randomSeed()
+        else:
+            self.seed = secrets.randbits(64)
+        self.Logger.log('SEED: %s', self.seed, level=LogLevel.INFO)
+        if self.generationWorkers > 0 and self.GenerationPool is None:
+            # kept for the next setups, shut down when the game ends
+            self.GenerationPool = generationPool(self.generationWorkers)
         self.LevelManager = LevelManager(
                                 self,
-                                self.RNG,
-                                height=10,
-                                width=20,
+                                self.seed,
+                                height=self.mapHeight,
+                                width=self.mapWidth,
                                 origin=(4,4),
-                                levels=3)
+                                levels=self.totalLevels,
+                                monsterChance=self.monsterChance,
+                                pool=self.GenerationPool)
         self.MenuManager = MenuManager()
         self.Messager = Messager()
-        startPos = [1,1]
-        self.LevelManager.defaultLevelSetupWalls(startPos)
+        self.Animator.clearQueue()
+        self.redrawAll = True
+        if bank is not None and bank.hasSeed(self.seed):
+            self.LevelManager.useSeedBank(bank, startPos)
+        else:
+            self.LevelManager.defaultLevelSetupWalls(startPos)
         self.LevelManager.addPlayer(pos=startPos, z=0)
         self.LevelManager.Player.update(
             self.LevelManager.getCurrentLevel().EntityLayer
         )
-        self.Timing.end()
+        self.Profiler.end()
         # update the game one time (generates FOV)
         self.loop(event=' ', energy=0)
 
-    def start(self, stdscr: curses.window=None):
+    def start(self, stdscr: 'curses.window'=None):
         '''
         Entry point for the game to start, will call the main loop after
         full initialization
@@ -117,7 +185,13 @@ class Game:
         self.main()
     
     def end(self):
-        self.Timing.show()
+        self.Profiler.show()
+        if self.Sampler:
+            self.Sampler.stop()
+            self.Sampler.write()
+        if self.GenerationPool is not None:
+            self.GenerationPool.shutdown()
+            self.GenerationPool = None
 
     def main(self):
         '''
@@ -173,6 +247,9 @@ class Game:
         '''
         Execute one loop in the game loop
         '''
+        self.Profiler.start('Game Loop')
+        if self.Sampler:
+            self.Sampler.beginTurn(self.MenuManager.TurnMenu.count+1)
 
         # event was valid, save it
         self.previousEvent = event
@@ -200,11 +277,14 @@ class Game:
             )
             self.LevelManager.Player.clearMentalMap(
                 self.LevelManager.getCurrentLevel().EntityLayer)
+            self.redrawAll = True
             # update level menu on level change
             self.MenuManager.DepthMenu.update(self.LevelManager.CurrentZ)
 
         # update player FOV
+        self.Profiler.start('Player FOV')
         self.LevelManager.setupPlayerFOV()
+        self.Profiler.end()
 
         # update health menu
         self.MenuManager.HealthMenu.update(
@@ -225,22 +305,49 @@ class Game:
         if not self.LevelManager.Player.Charge.charging:
             self.stateMachine('endrun')
 
+        if self.Sampler:
+            self.Sampler.endTurn()
+        self.Profiler.end()
+
     def render(self):
         '''
         Render the current game state to the screen
         '''
         # display through engine
         if self.Engine.frameReady():
-            # output
-            self.Engine.output(screenChars=self.ScreenBuffer,
-                                screenColors=self.ColorBuffer)
+            self.Profiler.start('Render')
+            overlays = self.Animator.currentFrames(time.perf_counter())
+            if overlays:
+                # draw animations on top without keeping them in the buffer
+                saved = self.ScreenBuffer.snapshot()
+                self.drawAnimations(overlays)
+                self.Engine.output(self.ScreenBuffer)
+                self.ScreenBuffer.restore(saved)
+            else:
+                # output
+                self.Engine.output(self.ScreenBuffer)
+            self.Profiler.end()
+
+    def drawAnimations(self, overlays):
+        '''
+        Draws the current frame of each playing animation to the screen buffer
+        '''
+        for animation, frame in overlays:
+            ar, ac = animation.pos[0], animation.pos[1]
+            for cell in frame:
+                color = cell[3] if len(cell) > 3 else animation.color
+                rw, cl = self.mapPosToScreenPos(ar+cell[0],ac+cell[1])
+                if self.ScreenBuffer.inBounds(rw, cl):
+                    self.ScreenBuffer.set(rw, cl, cell[2], color)
 
     def prepareBuffers(self):
         '''
         Updates the screen buffer
         '''
+        self.Profiler.start('Prepare Buffers')
         self.LayersToScreen()
         self.MenuManager.display(self.ScreenBuffer)
+        self.Profiler.end()
     
     def win(self):
         '''
@@ -258,57 +365,54 @@ class Game:
             return False
         return True
 
-    def boundsCheck(self, buffer, r, c):
-        '''
-        Checks if a position is valid within the screen buffer
-        '''
-        if (r > len(buffer)-1 or c > len(buffer[r])-1):
-            return False
-        return True
-
     def mapPosToScreenPos(self, r, c):
         return r+self.LevelManager.origin[0], c+self.LevelManager.origin[1]
     
     def LayersToScreen(self):
         '''
         Build buffers according to layer information
+
+        Only cells marked dirty by the level and the player FOV since the last
+        frame are recomposed, unless a full redraw was requested
         '''
+        level = self.LevelManager.getCurrentLevel()
+        player = self.LevelManager.Player
         if self.playerFOV:
-            entityLayer = self.LevelManager.Player.mentalMap
+            entityLayer = player.mentalMap
         else:
-            entityLayer = self.LevelManager.getCurrentLevel().EntityLayer
-        # go through entity layer
-        for r,row in enumerate(entityLayer):
-            for c,col in enumerate(row):
-                rw, cl = self.mapPosToScreenPos(r,c)
-                # find top most entity
-                if not entityLayer[r][c]:
-                    glyph = self.LevelManager.Player.unknownGlyph
-                    color = self.LevelManager.Player.unknownColor
-                elif len(entityLayer[r][c]) == 1:
-                    glyph = entityLayer[r][c][0].glyph
-                    color = entityLayer[r][c][0].color
-                else:
-                    idx = max(range(len(entityLayer[r][c])),
-                            key=lambda i:entityLayer[r][c][i].layer)
-                    glyph = entityLayer[r][c][idx].glyph
-                    color = entityLayer[r][c][idx].color
-                if not self.boundsCheck(self.ScreenBuffer, rw, cl):
-                    continue
-                # add glyph
-                self.ScreenBuffer[rw][cl] = glyph
-                if not self.boundsCheck(self.ColorBuffer, rw, cl):
-                    continue
-                # add color
-                self.ColorBuffer[rw][cl] = color
-        # go through light layer
-        lightLayer = self.LevelManager.getCurrentLevel().LightLayer
-        for r,row in enumerate(lightLayer):
-            for c,col in enumerate(row):
-                rw, cl = self.mapPosToScreenPos(r,c)
-                if lightLayer[r][c]:
-                    color = Colors().yellow
-                    self.ColorBuffer[rw][cl] = color
+            entityLayer = level.EntityLayer
+        dirtyCells = level.takeDirtyCells()
+        dirtyCells |= player.takeFOVDirtyCells()
+        if self.redrawAll:
+            self.redrawAll = False
+            dirtyCells = [(r,c) for r in range(len(entityLayer))
+                                for c in range(len(entityLayer[r]))]
+        lightLayer = level.LightLayer
+        # cells in sight hold the same entities as the level, use its cache
+        inSight = player.lastFOV if self.playerFOV else None
+        for r,c in dirtyCells:
+            rw, cl = self.mapPosToScreenPos(r,c)
+            if not self.ScreenBuffer.inBounds(rw, cl):
+                continue
+            # find top most entity
+            if inSight is None or (r,c) in inSight:
+                top = level.EntityLayer.top(r, c)
+            else:
+                top = None
+                for entity in entityLayer[r][c]:
+                    if top is None or entity.layer > top.layer:
+                        top = entity
+            if top is None:
+                glyph = player.unknownGlyph
+                color = player.unknownColor
+            else:
+                glyph = top.glyph
+                color = top.color
+            # lit spaces are always drawn yellow
+            if lightLayer[r][c]:
+                color = Colors().yellow
+            # add glyph and color
+            self.ScreenBuffer.set(rw, cl, glyph, color)
     
     def getEnergy(self, event):
         '''
@@ -337,7 +441,7 @@ class Game:
                 if self.previousEvent == '5':
                     self.stateMachine('startrun')
                 return 1,self.previousEvent+event
-        if event == chr(ascii.ESC) or event == 'q':
+        if event == '\x1b' or event == 'q':
             # QUIT
             self.running = False
         elif event == 'r':
@@ -347,6 +451,7 @@ class Game:
         elif event == 'f':
             # TOGGLE FOV
             self.playerFOV = not self.playerFOV
+            self.redrawAll = True
         elif event == ' ':
             # DO NOTHING - clears msg queue
             return 0,event
@@ -359,7 +464,7 @@ class Game:
             return 0,event
         elif self.GameState == GameState.PLAYING:
             # PLAYER ACTION
-            self.Logger.log(f'player action: {event}')
+            self.Logger.log('player action: %s', event)
             return 1,event
         # Defaults to returning -1 for no action
         return -1,event
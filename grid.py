@@ -0,0 +1,113 @@
+from entity import Layer
+
+class Cell(dict):
+    '''
+    Entities in one map cell keyed by id
+
+    Iterates over the entities (not the ids) in placement order, an entity
+    is added or removed in constant time
+    '''
+    __slots__ = ()
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def add(self, entity):
+        '''Adds an entity on top of the cell'''
+        self[entity.id] = entity
+
+    def discard(self, entity):
+        '''Removes an entity, returns False if it was not in the cell'''
+        return self.pop(entity.id, None) is not None
+
+class EntityGrid(list):
+    '''
+    2D grid of entity stacks (rows of Cell holding the entities)
+
+    Keeps the top most entity (highest layer) of every cell cached so the
+    renderer and rules code do not need to scan stacks. The level owning the
+    grid must call refresh after changing the entities in a cell.
+
+    Also keeps byte grids (one bytearray per row) derived from the top layer
+    that can be handed straight to the FOV and pathfinding algorithms.
+    '''
+    def __init__(self, height, width):
+        super().__init__([Cell() for _ in range(width)] for _ in range(height))
+        self.TopEntity = [[None for _ in range(width)] for _ in range(height)]
+        '''Top most entity of every cell, None if the cell is empty'''
+        self.Layers = [bytearray(width) for _ in range(height)]
+        '''Highest layer of every cell (0 if the cell is empty)'''
+        self.Blocking = [bytearray(width) for _ in range(height)]
+        '''1 where a creature cannot move in or be placed (monster or wall
+        layer), read by movement and placement'''
+        self.Opaque = [bytearray(width) for _ in range(height)]
+        '''1 where sight and thrown objects stop (wall layer), the inverse of
+        the transparency of a cell'''
+        self.Disturbed = []
+        '''Entities damaged since the owning level last woke them'''
+
+    def refresh(self, r, c):
+        '''
+        Recomputes the top most entity of a cell and the derived grids
+        '''
+        top = None
+        for entity in self[r][c]:
+            if top is None or entity.layer > top.layer:
+                top = entity
+        self.TopEntity[r][c] = top
+        layer = top.layer if top is not None else 0
+        self.Layers[r][c] = layer
+        self.Blocking[r][c] = layer >= Layer.MONST_LAYER
+        self.Opaque[r][c] = layer > Layer.MONST_LAYER
+
+    def fillTerrain(self, terrain, tiles):
+        '''
+        Replaces every cell by a cell holding only its terrain tile
+
+        terrain is a grid of tile ids (0 for none) indexing tiles, the derived
+        grids are translated from it a row at a time instead of refreshing
+        every cell
+        '''
+        layers = bytearray(256)
+        for tileId, tile in enumerate(tiles):
+            if tile is not None:
+                layers[tileId] = tile.layer
+        blocking = bytes(layer >= Layer.MONST_LAYER for layer in layers)
+        opaque = bytes(layer > Layer.MONST_LAYER for layer in layers)
+        items = [((tile.id, tile),) if tile is not None else ()
+                 for tile in tiles]
+        for r,row in enumerate(terrain):
+            self[r] = [Cell(items[tileId]) for tileId in row]
+            self.TopEntity[r] = [tiles[tileId] for tileId in row]
+            self.Layers[r] = row.translate(layers)
+            self.Blocking[r] = row.translate(blocking)
+            self.Opaque[r] = row.translate(opaque)
+
+    def disturb(self, entity):
+        '''
+        Records that an entity was damaged so the level wakes it up
+        '''
+        self.Disturbed.append(entity)
+
+    def takeDisturbed(self):
+        '''
+        Returns the entities damaged since the last call and clears them
+        '''
+        entities = self.Disturbed
+        self.Disturbed = []
+        return entities
+
+    def top(self, r, c):
+        '''
+        Returns the top most entity of a cell (None if empty)
+        '''
+        return self.TopEntity[r][c]
+
+    def maxLayer(self, r, c):
+        '''
+        Returns the highest layer in a cell, -1 if the cell is empty
+        '''
+        top = self.TopEntity[r][c]
+        if top is None:
+            return -1
+        return top.layer
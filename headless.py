@@ -0,0 +1,87 @@
+from array import array
+from colors import Colors
+from backend import Backend
+from screen import Screen, Palette, GLYPH_MASK, COLOR_SHIFT
+
+class HeadlessEngine(Backend):
+    '''
+    Headless backend, keeps the frame in memory instead of a terminal
+
+    The frame is held in a preallocated packed array (glyph index | color
+    index << 16, see Screen) so it can be inspected after rendering without
+    the curses module
+    '''
+    def __init__(self, rows=24, cols=80, debug=False):
+        super().__init__(debug=debug)
+        self.termrows = rows
+        '''height of the virtual screen'''
+        self.termcols = cols
+        '''width of the virtual screen'''
+        self.Frame = array('I', bytes(4*(rows-1)*(cols-1)))
+        '''packed cells of the last frame (row major)'''
+        self.frameCols = cols-1
+        '''width of the last frame'''
+        self.Palette = Palette()
+        '''glyph and color tables of the last frame'''
+        self.InputQueue = []
+        '''events handed back by readInput, oldest first'''
+        self.FrameCount = 0
+        '''number of frames output'''
+
+    def init(self, stdscr=None, timeDelay: int=None):
+        '''
+        Required to call at startup, returns size of the virtual screen
+        '''
+        self.Colors = Colors(display=False)
+        if timeDelay:
+            self.FrameDelay = timeDelay
+        self.Initialized = True
+        return self.termrows, self.termcols
+
+    def output(self, screen: Screen):
+        '''
+        Copies the packed screen buffer into the frame
+        '''
+        if not self.Initialized:
+            return
+        self.Frame[:] = screen.data
+        self.frameCols = screen.cols
+        self.Palette = screen.Palette
+        self.FrameCount += 1
+
+    def readInput(self):
+        '''
+        Returns the next queued event, None if there is nothing queued
+        '''
+        if self.InputQueue:
+            return self.InputQueue.pop(0)
+
+    def pause(self, t=1):
+        '''
+        No time passes on a headless backend
+        '''
+        pass
+
+    def glyphAt(self, r, c):
+        '''
+        Returns the glyph drawn at a screen position
+        '''
+        value = self.Frame[r*self.frameCols+c]
+        return self.Palette.glyphs[value & GLYPH_MASK]
+
+    def colorAt(self, r, c):
+        '''
+        Returns the color id drawn at a screen position
+        '''
+        value = self.Frame[r*self.frameCols+c]
+        return self.Palette.colors[value >> COLOR_SHIFT]
+
+    def screenText(self):
+        '''
+        Returns the frame as a list of strings, one per row
+        '''
+        cols = self.frameCols
+        glyphs = self.Palette.glyphs
+        return [''.join([glyphs[v & GLYPH_MASK]
+                         for v in self.Frame[r*cols:(r+1)*cols]])
+                    for r in range(len(self.Frame)//cols)]
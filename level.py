@@ -1,50 +1,313 @@
+import heapq
+import math
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from colors import Colors
 from entity import *
 from monster import *
 from tower import *
 from player import Player
-from logger import Logger, Timing
+from logger import Logger, LogLevel
+from profiler import Profiler
 from animation import *
-from algo import dijkstra
-import copy
+from algo import labelRegions, bridgePath
+from grid import EntityGrid, Cell
+
+GENERATOR_VERSION = 3
+'''Version of the level generation, bump it whenever the levels generated
+for a seed change so stored levels (seed banks) are not reused'''
+
+WALL_SHAPES = [
+    ['X  ',
+     'X  ',
+     'XXX'],
+    [' X ',
+     'XXX',
+     ' X '],
+    [' X ',
+     ' X ',
+     ' X '],
+    ['   ',
+     'X  ',
+     'XX '],
+]
+'''Wall shapes stamped on levels (L, plus, line, corner)'''
+
+def shapeRotations(shape):
+    '''
+    Returns the points (row, col offsets) of the 4 clockwise rotations of a
+    square shape
+    '''
+    size = len(shape)
+    rotations = []
+    for _ in range(4):
+        rotations.append(tuple((r, c) for r in range(size)
+                               for c in range(size) if shape[r][c] != ' '))
+        shape = [''.join(row) for row in zip(*shape[::-1])]
+    return rotations
+
+WALL_SHAPE_ROTATIONS = [points for shape in WALL_SHAPES
+                        for points in shapeRotations(shape)]
+'''Points of every rotation of every wall shape'''
+WALL_SHAPE_CHANCE = 0.09
+'''Chance of a wall shape starting on each cell'''
+
+def levelRNG(seed, z):
+    '''
+    Returns the random generator of a level, a stream derived from the game
+    seed and the level index only so levels do not depend on each other
+    '''
+    return random.Random(f'{seed}/{z}')
+
+def buildLevel(height, width, z, seed, monsterChance, startPos, walls, upstair):
+    '''
+    Generates everything on a level that only depends on its own random
+    stream, the stairs are connected to the level below afterwards
+
+    Module level so it can run in a generation worker process
+    '''
+    level = Level(height, width, z, levelRNG(seed, z),
+                  monsterChance=monsterChance)
+    if walls:
+        level.defaultWalls(playerPos=startPos if z == 0 else [],
+                           upstair=upstair)
+    else:
+        level.default(upstair=upstair)
+    level.generateMonsters(startPos)
+    level.addLighting()
+    return level
+
+def setupGenerationWorker(colors):
+    '''
+    Prepares a generation worker process, entities get the display colors
+    of the main process
+
+    Workers do not log, the log file belongs to the main process
+    '''
+    Logger().debugOn = False
+    Colors(display=False).__dict__.update(colors)
+
+def generationPool(workers) -> ProcessPoolExecutor:
+    '''
+    Returns a pool of worker processes for generating levels
+
+    The workers get the display colors of this process as they are when the
+    pool is made, so set up Colors first. The caller shuts the pool down.
+    '''
+    return ProcessPoolExecutor(max_workers=workers,
+                               initializer=setupGenerationWorker,
+                               initargs=(vars(Colors()),))
 
 class Level:
     '''
     Level objects contain the map and handle the entity layer
     '''
-    def __init__(self, height, width, z, rng):
+    def __init__(self, height, width, z, rng, monsterChance=3):
         self.height = height
         '''Total height (rows) of the level'''
         self.width = width
         '''Total width (cols) of the level'''
         self.z = z
         '''Depth level'''
-        self.EntityLayer = [[[] for _ in range(self.width)]
-                                for _ in range(self.height)]
+        self.EntityLayer = EntityGrid(self.height, self.width)
         '''Holds all entities on the level'''
         self.LightLayer = [[0 for _ in range(self.width)]
                                 for _ in range(self.height)]
         '''Tracks all lit spaces on level'''
         self.RNG = rng
         '''Random generator with optional seed'''
+        self.monsterChance = monsterChance
+        '''Percent chance (exclusive) of a monster on each open floor space'''
+        self.Profiler = Profiler()
+        '''Span profiler'''
+        self.DirtyCells = set()
+        '''Cells that changed since the level was last drawn'''
+        self.Terrain = [bytearray(self.width) for _ in range(self.height)]
+        '''Tile id of the terrain in every cell (NO_TILE if none)'''
+        self.Regions = None
+        '''Region number of every cell (0 for walls), cells with the same
+        number can reach each other, None until needed after walls changed'''
+        self.Actors = {}
+        '''Entities on the level that act during turns, by id'''
+        self.Updaters = {}
+        '''Entities updated every turn (Activate owners), by id'''
+        self.time = 0
+        '''Simulated time, moves forward as the player acts on the level'''
+        self.upstairPos = [-1,-1]
+        '''Position of the up stairs, [-1,-1] if the level has none'''
+        self.Schedule = []
+        '''Heap of (next act time, id, entity) of entities with a Brain'''
+        self.Scheduled = {}
+        '''Next act time of every scheduled entity by id, heap entries that
+        do not match are stale and skipped'''
         self.Logger = Logger()
 
-    def default(self, playerPos=[], downstairPos=[], upstair=True):
+    def markDirty(self, r, c):
+        '''
+        Records that a cell changed and needs to be drawn again
+        '''
+        self.DirtyCells.add((r,c))
+
+    def cellChanged(self, r, c):
+        '''
+        Call after changing the entities in a cell, refreshes the cached top
+        most entity and marks the cell to be drawn again
+        '''
+        opaque = self.EntityLayer.Opaque[r][c]
+        self.EntityLayer.refresh(r, c)
+        if self.EntityLayer.Opaque[r][c] != opaque:
+            # a wall was added or removed
+            self.Regions = None
+        self.DirtyCells.add((r,c))
+
+    def register(self, entity: Entity, schedule=True):
+        '''
+        Adds an entity to the actors if it owns a component that acts
+
+        Schedule set to false keeps the entity out of the time heap (the
+        player acts on input, not on the schedule)
+        '''
+        if (entity.Brain is not None or entity.Activate is not None or
+            entity.Health is not None or entity.Charge is not None):
+            self.Actors[entity.id] = entity
+        if entity.Activate is not None:
+            self.Updaters[entity.id] = entity
+        if (schedule and entity.Brain is not None and
+            entity.id not in self.Scheduled):
+            # first action one action time after arriving on the level
+            self.schedule(entity, self.time + entity.actionTime())
+
+    def unregister(self, entity: Entity):
+        '''
+        Drops an entity from the actors and the schedule
+        '''
+        self.Actors.pop(entity.id, None)
+        self.Updaters.pop(entity.id, None)
+        self.Scheduled.pop(entity.id, None)
+
+    def schedule(self, entity: Entity, time):
+        '''
+        Sets the next time an entity acts
+        '''
+        self.Scheduled[entity.id] = time
+        heapq.heappush(self.Schedule, (time, entity.id, entity))
+
+    def wake(self, entity: Entity):
+        '''
+        Schedules a sleeping entity to act on its next action
+        '''
+        time = self.time + entity.actionTime()
+        if self.Scheduled.get(entity.id, time) > time:
+            self.schedule(entity, time)
+
+    def takeDueActions(self, focus=None, stepTime=TURN_TIME):
+        '''
+        Pops the entities due to act by the level time and schedules their
+        next action
+
+        If a focus (the player position) is given, entities further from it
+        than they can see would only wait, they sleep until the focus could
+        be in sight (the focus moves at most one cell per stepTime)
+
+        Returns the number of actions each due entity takes by id, fast
+        entities may be due more than once
+        '''
+        due = {}
+        while self.Schedule and self.Schedule[0][0] <= self.time:
+            time, eid, entity = heapq.heappop(self.Schedule)
+            if self.Scheduled.get(eid) != time:
+                continue
+            if focus is not None:
+                distance = max(abs(entity.pos[0]-focus[0]),
+                               abs(entity.pos[1]-focus[1]))
+                gap = distance - entity.Brain.sightRange
+                if gap > 0:
+                    self.schedule(entity, self.time + gap * stepTime)
+                    continue
+            count = 0
+            while time <= self.time:
+                count += 1
+                time += entity.actionTime()
+            due[eid] = count
+            self.schedule(entity, time)
+        return due
+
+    def removeEntity(self, entity: Entity):
+        '''
+        Removes an entity from its cell of the entity layer and the actors
+
+        Returns False if the entity was not on this level
+        '''
+        if not self.takeFromCell(entity):
+            return False
+        self.unregister(entity)
+        return True
+
+    def moveEntity(self, entity: Entity, pos):
+        '''
+        Moves an entity already on the level to another cell, it keeps its
+        place in the actors and the schedule
+        '''
+        if self.takeFromCell(entity):
+            self.placeEntity(entity, pos, schedule=False)
+
+    def takeFromCell(self, entity: Entity):
+        '''
+        Takes an entity out of its cell, returns False if it was not there
+        '''
+        r, c = entity.EntityLayerPos
+        if r < 0 or not self.EntityLayer[r][c].discard(entity):
+            return False
+        entity.EntityLayerPos = [-1, -1]
+        self.cellChanged(r, c)
+        return True
+
+    def inMapOrder(self, entities: list):
+        '''
+        Returns entities sorted by the cell holding them (row, col), the
+        order a scan of the map would find them
+        '''
+        return sorted(entities, key=lambda e: e.EntityLayerPos)
+
+    def takeDirtyCells(self):
+        '''
+        Returns the cells changed since the last call and clears them
+        '''
+        cells = self.DirtyCells
+        self.DirtyCells = set()
+        return cells
+
+    def markLightChanges(self, oldLightLayer):
+        '''
+        Marks the cells whose lighting differs from a previous light layer
+        '''
+        for r,row in enumerate(self.LightLayer):
+            if row == oldLightLayer[r]:
+                continue
+            for c,lit in enumerate(row):
+                if lit != oldLightLayer[r][c]:
+                    self.markDirty(r, c)
+
+    def default(self, playerPos=[], upstair=True):
         '''Loads a default map'''
         # generate walls and floor
         self.generateSurroundingWallsFloor()
+        self.placeTerrain()
         # add stairs
-        return self.generateStairs(
-            playerPos=playerPos, downstairPos=downstairPos, upstair=upstair)
+        if upstair:
+            self.placeUpstairs()
     
-    def defaultWalls(self, playerPos=[], downstairPos=[], upstair=True):
+    def defaultWalls(self, playerPos=[], upstair=True):
         '''Loads a map with some walls'''
         # generate walls and floor
         self.generateSurroundingWallsFloor()
         # add wall shapes
         self.wallShapeGenerator(playerPos=playerPos, minWallsPlaced=45)
+        self.placeTerrain()
         # add stairs
-        return self.generateStairs(
-            playerPos=playerPos, downstairPos=downstairPos, upstair=upstair)
+        if upstair:
+            self.placeUpstairs()
 
     def addLighting(self):
         '''
@@ -52,7 +315,7 @@ class Level:
         '''
         for r in range(self.height):
             for c in range(self.width):
-                maxLayer = max([x.layer for x in self.EntityLayer[r][c]])
+                maxLayer = self.EntityLayer.maxLayer(r, c)
                 if (maxLayer == Layer.FLOOR_LAYER
                     and self.RNG.randint(1,100) < 3):
                     self.placeEntity(Light(), [r,c])
@@ -60,93 +323,77 @@ class Level:
     def wallShapeGenerator(self, playerPos=[], minWallsPlaced=10):
         '''
         Generates walls on the level using predetermined shapes
-        minWallsPlaced counts how many wall spaces need to be covered in the 
-        level
-        '''
-        wallShapes = []
-        wallL = [
-            ['0','',''],
-            ['0','',''],
-            ['0','0','0']
-        ]
-        wallPlus = [
-            ['','0',''],
-            ['0','0','0'],
-            ['','0','']
-        ]
-        wallLine = [
-            ['','0',''],
-            ['','0',''],
-            ['','0','']
-        ]
-        wallCorner = [
-            ['','',''],
-            ['0','',''],
-            ['0','0','']
-        ]
-        wallShapes.append(wallL)
-        wallShapes.append(wallPlus)
-        wallShapes.append(wallLine)
-        wallShapes.append(wallCorner)
+        minWallsPlaced counts how many floor spaces need to be turned into
+        walls in the level
+
+        Shapes are stamped onto the terrain grid, call placeTerrain after.
+        Each cell starts a shape with WALL_SHAPE_CHANCE, instead of a random
+        draw per cell the number of cells skipped until the next shape is
+        drawn, then one draw picks the shape and its rotation.
+        '''
+        wall = WALL.tileId
+        cells = self.height * self.width
+        logMiss = math.log(1 - WALL_SHAPE_CHANCE)
         wallsPlaced = 0
         maxIterations = 100
         # go through until minimum wall amount was reached or max tries
         while wallsPlaced < minWallsPlaced and maxIterations > 0:
             maxIterations -= 1
-            for r in range(self.height):
-                for c in range(self.width): 
-                    if self.RNG.randint(1,100) < 10:
-                        # grab a shape and rotate it
-                        shape = wallShapes[self.RNG.randint(0,len(wallShapes)-1)]
-                        times = self.RNG.randint(0,3)
-                        for t in range(times):
-                            shape = [list(row) for row in zip(*shape[::-1])]
-                        for sr,srows in enumerate(shape):
-                            for sc,scols in enumerate(srows):
-                                pt = [r+sr,c+sc]
-                                # not a point in the shape
-                                if not scols:
-                                    continue
-                                # player is already there
-                                if playerPos and pt == playerPos:
-                                    continue
-                                self.placeEntity(Wall(), pt)
-                                wallsPlaced += 1
+            idx = int(math.log(1 - self.RNG.random()) / logMiss)
+            while idx < cells:
+                r, c = divmod(idx, self.width)
+                shape = WALL_SHAPE_ROTATIONS[
+                    self.RNG.randrange(len(WALL_SHAPE_ROTATIONS))]
+                for sr, sc in shape:
+                    pr, pc = r+sr, c+sc
+                    if pr >= self.height or pc >= self.width:
+                        continue
+                    # player is already there
+                    if playerPos and pr == playerPos[0] and pc == playerPos[1]:
+                        continue
+                    row = self.Terrain[pr]
+                    if row[pc] != wall:
+                        row[pc] = wall
+                        wallsPlaced += 1
+                idx += 1 + int(math.log(1 - self.RNG.random()) / logMiss)
 
     def findFreeSpace(self, entity: Entity, pos: list):
         '''
-        If an entity can't be placed on the spot it was specified for,
+        If a creature can't be placed on the spot it was specified for,
         find other available points around
         '''
+        blocking = self.EntityLayer.Blocking
         # check first point
         r,c = pos[0], pos[1]
-        maxLayer = max([x.layer for x in self.EntityLayer[r][c]])
-        if entity.layer > maxLayer:
+        if not blocking[r][c]:
             return [r,c]
         # check for surrounding points that are open
         points = getOneLayerPts(pos)
         for pt in points:
             r,c = pt[0], pt[1]
-            maxLayer = max([x.layer for x in self.EntityLayer[r][c]])
-            if entity.layer > maxLayer:
+            if not blocking[r][c]:
                 return [r,c]
         return [-1,-1]
 
-    def placeEntity(self, entity: Entity, pos, overwrite=False, specific=True):
+    def placeEntity(self, entity: Entity, pos, overwrite=False, specific=True,
+                    schedule=True):
         '''
         Places an entity somewhere valid on the map
         Overwrite set to true will delete any other entities at that position
         Overwrite set to false will simply append
         Specific is used when a spot may be filled by another entity (going to 
         a new level by stairs), False let's placement be around the position
+        Schedule set to false does not add the entity to the time heap
         '''
         r = pos[0]
         c = pos[1]
         if self.withinMap(pos):
             if overwrite:
                 # if overwriting, specific position will always work
-                self.EntityLayer[r][c] = [entity]
-                entity.setPosition(pos=pos, zlevel=self.z, idx=0)
+                for old in self.EntityLayer[r][c]:
+                    self.unregister(old)
+                self.EntityLayer[r][c] = Cell()
+                self.Terrain[r][c] = NO_TILE
             else:
                 # if appending, position may be full
                 if entity.layer > Layer.OBJECT_LAYER:
@@ -154,60 +401,169 @@ class Level:
                     # are not able to be placed on top of another large layer
                     if not specific:
                         r,c = self.findFreeSpace(entity, pos)
-                    maxLayer = max([x.layer for x in self.EntityLayer[r][c]])
-                    if entity.layer <= maxLayer:
-                        self.Logger.log(f'Error: layer issue with placement -> {entity.name} {maxLayer} {self.EntityLayer[r][c]}')
+                        if r < 0:
+                            self.Logger.log('Error: no free space for placement -> %s %s',
+                                            entity.name, pos,
+                                            level=LogLevel.ERROR)
+                            return
+                    if self.EntityLayer.Blocking[r][c]:
+                        self.Logger.log('Error: layer issue with placement -> %s %s %s',
+                                        entity.name, self.EntityLayer.Layers[r][c],
+                                        self.EntityLayer[r][c],
+                                        level=LogLevel.ERROR)
                         return
-                self.EntityLayer[r][c].append(entity)
-                entity.setPosition(pos=pos,
-                                zlevel=self.z,
-                                idx=len(self.EntityLayer[r][c])-1)
-                # self.Logger.log(f'Placing entity -> {entity.name} {pos}')
+            self.EntityLayer[r][c].add(entity)
+            self.register(entity, schedule)
+            entity.EntityLayerPos = [r, c]
+            # the entity may have been placed around the given position, it
+            # gets its own list so the caller's is never moved along with it
+            entity.setPosition(pos=[r, c], zlevel=self.z)
+            self.cellChanged(r, c)
         else:
-            self.Logger.log(f'Error: entity outside of map -> {entity.name} {pos}')
+            self.Logger.log('Error: entity outside of map -> %s %s',
+                            entity.name, pos, level=LogLevel.ERROR)
 
-    def generateStairs(self, playerPos=[], downstairPos=[], upstair=True):
+    def placeTile(self, tile: Tile, pos, overwrite=False):
+        '''
+        Places a terrain tile on the map
+        Overwrite set to true will delete any other entities at that position
+        Overwrite set to false will put the tile on top of the cell
+        '''
+        if not self.withinMap(pos):
+            self.Logger.log('Error: tile outside of map -> %s %s',
+                            tile.name, pos, level=LogLevel.ERROR)
+            return
+        r, c = pos[0], pos[1]
+        if overwrite:
+            for old in self.EntityLayer[r][c]:
+                self.unregister(old)
+            self.EntityLayer[r][c] = Cell()
+        self.EntityLayer[r][c].add(tile)
+        self.Terrain[r][c] = tile.tileId
+        self.cellChanged(r, c)
+
+    def placeUpstairs(self):
         '''
-        Adds downstairs if there was a previous upstairs on the level below
         Adds upstairs somewhere random
-        Makes sure there is a path between stair wells
         '''
-        # add stairs
-        upstairPos = [-1,-1]
+        self.upstairPos = [self.RNG.randint(1,self.height-2),
+                                        self.RNG.randint(1,self.width-2)]
+        self.placeEntity(StairUp(), list(self.upstairPos), overwrite=True)
+
+    def connectStairs(self, playerPos=[], downstairPos=[]):
+        '''
+        Adds downstairs if there was a previous upstairs on the level below
+        Makes sure there is a path between stair wells, walls are only
+        carved if the stairs are in separate regions
+        '''
         if downstairPos:
-            self.placeEntity(StairDown(), downstairPos, overwrite=True)
-        if upstair:
-            upstairPos = [self.RNG.randint(1,self.height-2),
-                                            self.RNG.randint(1,self.width-2)]
-            self.placeEntity(StairUp(), upstairPos, overwrite=True)
-        else:
+            # both stairs share the cell if they landed on the same spot
+            self.placeEntity(StairDown(), list(downstairPos),
+                             overwrite=downstairPos != self.upstairPos)
+        if self.upstairPos[0] < 0:
             # no need to path check if last level
-            return upstairPos
-        # create a path between stair wells
+            return
+        # bridge the regions of the stair wells
         start = downstairPos
         if not downstairPos:
             start = playerPos
-        end = upstairPos
-        grid = [[max([e.layer for e in el]) for el in row]
-                    for row in self.EntityLayer]
-        pts = dijkstra(grid, tuple(start), tuple(end), diagonals=False)
-        for pt in pts:
-            if pt == pts[0] or pt == pts[-1]:
-                continue
-            self.placeEntity(Floor(),pt,overwrite=True)
-        return upstairPos
+        self.connect(start, self.upstairPos)
+
+    def renumberEntities(self):
+        '''
+        Gives every entity on the level a fresh id from this process, needed
+        for levels generated in another process
+
+        Ids are handed out in the order the entities were created so they
+        compare the same as if the level was generated here
+        '''
+        entities = [e for row in self.EntityLayer for cell in row
+                    for e in cell if isinstance(e, Entity)]
+        ids = {}
+        for entity in sorted(entities, key=lambda e: e.id):
+            ids[entity.id] = entity.id = next(Entity._id_gen)
+        for row in self.EntityLayer:
+            for c,cell in enumerate(row):
+                row[c] = Cell((e.id, e) for e in cell)
+        self.Actors = {e.id: e for e in self.Actors.values()}
+        self.Updaters = {e.id: e for e in self.Updaters.values()}
+        self.Scheduled = {ids[eid]: time for eid, time in self.Scheduled.items()}
+        self.Schedule = [(time, e.id, e) for time, _, e in self.Schedule]
+        heapq.heapify(self.Schedule)
 
     def generateSurroundingWallsFloor(self):
         '''
-        Adds surrounding walls and floor to a blank entity array
+        Fills the terrain grid with floor surrounded by walls, call
+        placeTerrain after
         '''
+        wall, floor = bytes([WALL.tileId]), bytes([FLOOR.tileId])
         for r in range(self.height):
-            for c in range(self.width):
-                # check if within the array or on the border
-                if r == 0 or c == 0 or r == self.height-1 or c == self.width-1:
-                    self.placeEntity(Wall(),[r,c],overwrite=True)
-                else:
-                    self.placeEntity(Floor(),[r,c],overwrite=True)
+            if r == 0 or r == self.height-1:
+                self.Terrain[r] = bytearray(wall * self.width)
+            else:
+                self.Terrain[r] = bytearray(
+                    wall + floor * (self.width-2) + wall)
+
+    def placeTerrain(self):
+        '''
+        Fills every cell with the tile of the terrain grid, meant for a new
+        level before any entity is placed
+
+        Cells are not marked dirty, a new level is drawn in full
+        '''
+        self.EntityLayer.fillTerrain(self.Terrain, TILES)
+        self.Regions = None
+
+    def regions(self):
+        '''
+        Returns the region number of every cell (0 for walls), labeling the
+        open regions again if walls changed
+
+        Regions are 8-connected like movement, creatures do not split them
+        '''
+        if self.Regions is None:
+            self.Profiler.start('Connectivity')
+            self.Regions, _ = labelRegions(self.EntityLayer.Opaque)
+            self.Profiler.end()
+        return self.Regions
+
+    def regionOf(self, pos):
+        '''
+        Returns the region number of a position, 0 if it is a wall
+        '''
+        return self.regions()[pos[0]][pos[1]]
+
+    def connected(self, a, b):
+        '''
+        Returns if position b can be reached from position a
+        '''
+        regions = self.regions()
+        region = regions[a[0]][a[1]]
+        return region != 0 and region == regions[b[0]][b[1]]
+
+    def connect(self, a, b):
+        '''
+        Makes sure position b can be reached from position a by carving the
+        fewest walls between their regions, both positions must be open
+
+        Returns the carved positions, None if they cannot be connected
+        '''
+        if self.connected(a, b):
+            return []
+        target = self.regionOf(b)
+        if not target or not self.regionOf(a):
+            self.Logger.log('Error: can not connect walls -> %s %s', a, b,
+                            level=LogLevel.ERROR)
+            return None
+        self.Profiler.start('Pathfinding')
+        pts = bridgePath(self.EntityLayer.Opaque, self.Regions,
+                         tuple(a), target)
+        self.Profiler.end()
+        if pts is None:
+            return None
+        for pt in pts:
+            self.placeTile(FLOOR, pt, overwrite=True)
+        return pts
 
     def withinMap(self, pos):
         '''
@@ -223,9 +579,9 @@ class Level:
             for c in range(self.width):
                 if [r,c] == playerPos:
                     continue
-                maxLayer = max([x.layer for x in self.EntityLayer[r][c]])
+                maxLayer = self.EntityLayer.maxLayer(r, c)
                 if (maxLayer == Layer.FLOOR_LAYER
-                    and self.RNG.randint(1,100) < 3):
+                    and self.RNG.randint(1,100) < self.monsterChance):
                     if self.RNG.randint(1,2) == 1:
                         m = Jelly()
                     else:
@@ -237,8 +593,8 @@ class LevelManager:
     LevelManager class contains all level objects and dictates what the game
     class will display
     '''
-    def __init__(self, game, rng, height: int=0, width: int=0, origin: tuple=(0,0),
-        levels=0):
+    def __init__(self, game, seed, height: int=0, width: int=0, origin: tuple=(0,0),
+        levels=0, monsterChance=3, pool: ProcessPoolExecutor=None):
         self.Game = game
         '''Reference to game object'''
         self.height = height
@@ -247,55 +603,161 @@ class LevelManager:
         '''Total width (cols) in the map'''
         self.origin = origin
         '''Top left corner of map in relation to the screen buffer'''
-        self.Levels = []
-        '''Holds all level objects'''
+        self.seed = seed
+        '''Game seed the level random streams are derived from'''
+        self.monsterChance = monsterChance
+        '''Percent chance (exclusive) of a monster on each open floor space'''
+        self.Levels = [None] * levels
+        '''Holds all level objects, None until a level is first entered'''
+        self.startPos = []
+        '''Player starting position, kept free by level generation'''
+        self.levelWalls = True
+        '''Generate levels with wall shapes'''
+        self.prefetchDistance = 5
+        '''Distance to the up stairs at which the next level is generated in
+        the background, 0 turns prefetching off'''
+        self.Prefetch = None
+        '''Thread generating the next level in the background'''
+        self.SeedBank = None
+        '''Seed bank holding the levels of the seed, levels are loaded from
+        it instead of generated'''
+        self.GenerationPool = pool
+        '''Worker processes generating all levels up front, None generates
+        each level when it is first entered'''
         self.TotalLevels = levels
         '''How many levels to hold'''
         self.CurrentZ = 0
         '''Current level indicator'''
         self.Player = None
         '''Player object'''
-        self.Animator = Animator()
-        '''Animation manager'''
-        self.Timing = Timing()
-        '''Timing recorder'''
+        self.Profiler = Profiler()
+        '''Span profiler'''
+        self.sleepFarEntities = True
+        '''Entities out of reach of the player's sight sleep instead of
+        acting every turn'''
         self.Logger = Logger()
-        for l in range(self.TotalLevels):
-            self.Levels.append(Level(self.height, self.width, l, rng))
         
     def defaultLevelSetup(self, playerPos):
         '''
-        Load a default map on all levels
+        Load a default map on all levels, each level is generated when it is
+        first entered
         '''
-        downstairPos = []
-        for level in self.Levels:
-            if level == self.Levels[-1]:
-                downstairPos = level.default(
-                    downstairPos=downstairPos, upstair=False)
-            elif level == self.Levels[0]:
-                downstairPos = level.default(
-                    playerPos=playerPos, downstairPos=downstairPos)
-            else:
-                downstairPos = level.default(downstairPos=downstairPos)
-            level.generateMonsters(playerPos)
-            level.addLighting()
+        self.startPos = list(playerPos)
+        self.levelWalls = False
+        self.generateLevel(0)
+        if self.GenerationPool is not None:
+            self.generateAllLevels()
 
     def defaultLevelSetupWalls(self, playerPos):
         '''
-        Load a default map with some walls
+        Load a default map with some walls, each level is generated when it is
+        first entered
+        '''
+        self.startPos = list(playerPos)
+        self.levelWalls = True
+        self.generateLevel(0)
+        if self.GenerationPool is not None:
+            self.generateAllLevels()
+
+    def useSeedBank(self, bank, playerPos):
+        '''
+        Loads the levels of the seed from a seed bank instead of generating
+        them, each level is loaded when it is first entered
+        '''
+        self.startPos = list(playerPos)
+        self.levelWalls = True
+        self.SeedBank = bank
+        self.generateLevel(0)
+
+    def generateLevel(self, z) -> Level:
         '''
+        Returns a level, generating it (and the levels below it) or loading
+        it from the seed bank first if it was never entered
+
+        The down stairs of a level are placed on the up stairs of the level
+        below, everything else only depends on the level random stream
+        '''
+        if self.Levels[z] is not None:
+            return self.Levels[z]
+        if (self.Prefetch is not None and
+            self.Prefetch is not threading.current_thread()):
+            # the level may be in the works already
+            self.Prefetch.join()
+            self.Prefetch = None
+            return self.generateLevel(z)
+        if self.SeedBank is not None:
+            self.Levels[z] = self.SeedBank.level(self.seed, z)
+            return self.Levels[z]
         downstairPos = []
-        for level in self.Levels:
-            if level == self.Levels[-1]:
-                downstairPos = level.defaultWalls(
-                    downstairPos=downstairPos, upstair=False)
-            elif level == self.Levels[0]:
-                downstairPos = level.defaultWalls(
-                    playerPos=playerPos, downstairPos=downstairPos)
-            else:
-                downstairPos = level.defaultWalls(downstairPos=downstairPos)
-            level.generateMonsters(playerPos)
-            level.addLighting()
+        if z > 0:
+            downstairPos = self.generateLevel(z-1).upstairPos
+        self.Profiler.start('Level Generation')
+        level = buildLevel(*self.buildArgs(z))
+        level.connectStairs(playerPos=self.startPos, downstairPos=downstairPos)
+        # only visible once complete
+        self.Levels[z] = level
+        self.Profiler.end()
+        return level
+
+    def buildArgs(self, z):
+        '''
+        Returns the arguments of buildLevel for a level
+        '''
+        return (self.height, self.width, z, self.seed, self.monsterChance,
+                self.startPos, self.levelWalls, z < self.TotalLevels-1)
+
+    def generateAllLevels(self):
+        '''
+        Generates every level not generated yet, spread over the worker
+        processes of the generation pool
+
+        Levels only depend on their own random stream so the workers build
+        them independently, the stairs are then connected in order in this
+        process. The result is the same as generating the levels one by one.
+        '''
+        if self.Prefetch is not None:
+            self.Prefetch.join()
+            self.Prefetch = None
+        missing = [z for z in range(self.TotalLevels) if self.Levels[z] is None]
+        if not missing:
+            return
+        self.Profiler.start('Level Generation')
+        futures = {z: self.GenerationPool.submit(buildLevel,
+                                                 *self.buildArgs(z))
+                   for z in missing}
+        for z in missing:
+            level = futures[z].result()
+            # ids from the worker may clash with ids of this process
+            level.renumberEntities()
+            downstairPos = []
+            if z > 0:
+                downstairPos = self.Levels[z-1].upstairPos
+            level.connectStairs(playerPos=self.startPos,
+                                downstairPos=downstairPos)
+            self.Levels[z] = level
+        self.Profiler.end()
+
+    def prefetchNextLevel(self):
+        '''
+        Starts generating the level above in a background thread when the
+        player gets close to the up stairs, so taking them does not stall
+        '''
+        if self.Prefetch is not None:
+            if self.Prefetch.is_alive():
+                return
+            self.Prefetch = None
+        z = self.CurrentZ + 1
+        if (not self.prefetchDistance or z >= self.TotalLevels or
+            self.Levels[z] is not None):
+            return
+        stairs = self.Levels[self.CurrentZ].upstairPos
+        pos = self.Player.pos
+        if max(abs(pos[0]-stairs[0]),
+               abs(pos[1]-stairs[1])) > self.prefetchDistance:
+            return
+        self.Prefetch = threading.Thread(target=self.generateLevel, args=(z,),
+                                         name='LevelPrefetch', daemon=True)
+        self.Prefetch.start()
 
     def addPlayer(self, pos: list, z: int):
         '''
@@ -303,39 +765,54 @@ class LevelManager:
         '''
         self.Player = Player(self.height, self.width)
         if len(self.Levels) > 0 and z < len(self.Levels):
-            self.Levels[z].placeEntity(self.Player, pos)
+            self.generateLevel(z).placeEntity(self.Player, pos,
+                                              schedule=False)
         else:
-            self.Logger.log(f'Error: invalid placement of player!')
+            self.Logger.log('Error: invalid placement of player!',
+                            level=LogLevel.ERROR)
 
     def updateCurrentLevel(self, playerEvent, turn, energy):
         '''
-        Go through current level layer and update entities
+        Go through the entities due on the current level and update them
         
         If an entity has 
         updated its own position, move it to the right spot
 
         Update the player first before everything
 
-        Pass the player's action to the player entity
+        Pass the player's action to the player entity, the time it takes
+        moves the level time forward and entities scheduled by then act
 
         Entities that affect other entities add those entities to the stack to
         be updated next
 
         Clear the light array every loop
-
-        Play the animations generated from an entity turn
         '''
         # timing
-        self.Timing.start('Game Loop')
+        self.Profiler.start('Entity Update')
 
         level = self.Levels[self.CurrentZ]
 
         # clear light layer
+        oldLightLayer = level.LightLayer
         level.LightLayer = [[0 for _ in range(self.width)]
                                 for _ in range(self.height)]
-        # get list of all entities to update
-        entityStack = [entity for row in level.EntityLayer 
-                            for entityList in row for entity in entityList]
+        # the player's action moves time forward
+        if energy > 0:
+            level.time += self.Player.actionTime()
+        focus = self.Player.pos if self.sleepFarEntities else None
+        actions = level.takeDueActions(focus, self.Player.actionTime())
+        # the player acts on input, not on the schedule
+        actions[self.Player.id] = 0
+        if self.Player.turn < turn:
+            self.Player.turn = turn
+            actions[self.Player.id] = 1
+        # get list of all entities to update, popped from the end so the
+        # reversed map order keeps the order of a full scan of the map
+        entityStack = [level.Actors[eid] for eid, count in actions.items()
+                        for _ in range(count) if eid in level.Actors]
+        entityStack.extend(level.Updaters.values())
+        entityStack = level.inMapOrder(entityStack)
         # make sure player updates first
         entityStack.append(self.Player)
         while entityStack:
@@ -347,9 +824,9 @@ class LevelManager:
             isDead, fromDeath = self.removeIfDead(entity, level)
             if not isDead:
                 # entity is alive
-                if entity.turn < turn:
-                    # entity has not yet taken a turn
-                    entity.turn = turn
+                if actions.get(entity.id, 0) > 0:
+                    # entity has an action left this turn
+                    actions[entity.id] -= 1
                     fromInput = entity.input(energy,
                                             level.EntityLayer,
                                             self.Player.pos,
@@ -372,49 +849,15 @@ class LevelManager:
             if addEntities:
                 for e in addEntities:
                     if e:
-                        self.Logger.log(f'Adding -> {e.name} {e.pos}')
+                        self.Logger.log('Adding -> %s %s', e.name, e.pos)
                         entityStack.append(e)
-
-            # play animations (could be queued from death)
-            self.Timing.pause()
-            self.animations()
-            self.Timing.resume()
-        self.Timing.end()
-
-    def animations(self):
-        '''
-        Display animations
-        '''
-        if self.Animator.AnimationQueue:
-            # save off screen buffer
-            oldScreenBuffer = copy.deepcopy(self.Game.ScreenBuffer)
-            oldColorBuffer = copy.deepcopy(self.Game.ColorBuffer)
-            # animations have been queued
-            frameCounter = 0
-            maxFrames = max([len(list(x.frames.keys()))
-                             for x in self.Animator.AnimationQueue])
-            for frameCounter in range(maxFrames):
-                # draw on the old buffer
-                self.Game.ScreenBuffer = copy.deepcopy(oldScreenBuffer)
-                self.Game.ColorBuffer = copy.deepcopy(oldColorBuffer)
-                for animation in self.Animator.AnimationQueue:
-                    if frameCounter >= len(list(animation.frames.keys())):
-                        continue
-                    ar, ac = animation.pos[0], animation.pos[1]
-                    delay = animation.delay
-                    # add frame array to the screen
-                    for r,row in enumerate(animation.frames[str(frameCounter)]):
-                        for c,col in enumerate(row):
-                            if not col:
-                                continue
-                            rw, cl = self.Game.mapPosToScreenPos(ar+r,ac+c)
-                            self.Game.ScreenBuffer[rw][cl] = col
-                            self.Game.ColorBuffer[rw][cl] = animation.color
-                # output to terminal
-                self.Game.render()
-                self.Game.Engine.pause(delay)
-            # done with all animations
-            self.Animator.clearQueue()
+        # damaged entities react on their next action
+        for entity in level.EntityLayer.takeDisturbed():
+            level.wake(entity)
+        # lights may have been turned on or off
+        level.markLightChanges(oldLightLayer)
+        self.prefetchNextLevel()
+        self.Profiler.end()
 
     def setupPlayerFOV(self):
         '''
@@ -430,21 +873,11 @@ class LevelManager:
         '''
         if not entity.isActive:
             entities = []   # death may trigger other kills
-            r = entity.EntityLayerPos[0]
-            c = entity.EntityLayerPos[1]
-            idx = entity.EntityLayerPos[2]
-            if idx >= len(level.EntityLayer[r][c]):
-                # not enough entity on the square for this entity to still be
-                # here, must have already been removed
-                return True, []
-            try:
-                if level.EntityLayer[r][c][idx].id == entity.id:
-                    del level.EntityLayer[r][c][idx]
-                    # call entity death ONLY if it is the same entity
-                    entities = entity.death(level.EntityLayer)
-                    self.Logger.log(f'REMOVING: {entity.name} {r},{c},{idx}')
-            except Exception as e:
-                self.Logger.log(f'Error: failed to remove {entity.name}:{r},{c},{idx}')
+            r, c = entity.EntityLayerPos
+            # call entity death ONLY if it was still on the level
+            if level.removeEntity(entity):
+                entities = entity.death(level.EntityLayer)
+                self.Logger.log('REMOVING: %s %s,%s', entity.name, r, c)
             return True, entities
         return False, []
     
@@ -454,34 +887,25 @@ class LevelManager:
         to its own position, fixes the entity's entityLayerPos coords
         '''
         # check if entity has been placed on the level
-        if entity.EntityLayerPos[2] == -1:
+        if entity.EntityLayerPos[0] == -1:
             # entity has just been created, not on level yet
             level.placeEntity(entity, entity.pos)
         else:
             # move entity around current level
-            r = entity.EntityLayerPos[0]
-            c = entity.EntityLayerPos[1]
-            idx = entity.EntityLayerPos[2]
+            r, c = entity.EntityLayerPos
             if (entity.pos[0] != r or entity.pos[1] != c):
-                # remove entity at old spot
-                # self.Logger.log(f'Trying to remove -> {entity.name} {entity.isActive} {entity.EntityLayerPos} {entity.pos}')
-                del level.EntityLayer[r][c][idx]
-                # place new entity and update r, c, idx
-                level.placeEntity(entity, entity.pos)
+                level.moveEntity(entity, entity.pos)
             # move entity to another level
             if (entity.z != self.CurrentZ and 
                     entity.z < self.TotalLevels):
-                try:
-                    # make sure the entity is not already moved to a new level
-                    if level.EntityLayer[r][c][idx].id == entity.id:
-                        # remove entity at old spot
-                        del level.EntityLayer[r][c][idx]
-                        # place entity and update r, c, idx
-                        self.Levels[entity.z].placeEntity(entity,
-                                                        entity.pos,
-                                                        specific=False)
-                except:
-                    self.Logger.log(f'Skipping moving {entity.name} to new level')
+                # make sure the entity is not already moved to a new level
+                if level.removeEntity(entity):
+                    self.generateLevel(entity.z).placeEntity(
+                        entity, entity.pos, specific=False,
+                        schedule=entity is not self.Player)
+                else:
+                    self.Logger.log('Skipping moving %s to new level', entity.name,
+                                    level=LogLevel.WARNING)
 
     def swapLevels(self):
         '''
@@ -1,77 +1,88 @@
-import time
+import queue
+import threading
+import atexit
+import traceback
+import multiprocessing
+from enum import IntEnum
 
-class Timing:
-    '''Timing object'''
+class LogLevel(IntEnum):
+    '''
+    Log Levels:
+        10: detailed information for debugging the game loop
+        20: general information about the game
+        30: something unexpected that the game recovered from
+        40: something failed
+    '''
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+class LogWriter:
+    '''
+    Singleton class that writes log records from a background thread
+
+    Records are queued in memory and the thread drains everything queued at
+    once, appending to each file with one write. Queued records are flushed
+    when the program exits.
+    '''
     _instance = None
 
     def __new__(obj):
         if not obj._instance:
-            obj._instance = super(Timing, obj).__new__(obj)
+            obj._instance = super(LogWriter, obj).__new__(obj)
             obj._instance.init()
         return obj._instance
 
     def init(self):
-        self.measurements = {}
-        '''Holds all measurements'''
-        self.logfile = 'time.log'
-        '''Log file'''
-        self.currentName = ''
-        '''Current measurement name being taken'''
-        self.current = []
-        '''Holds start and end time'''
-        self.gap = []
-        '''Holds start and end time of the pause'''
-        self.subtract = 0
-        '''Holds an amount of time to subtract at the end'''
-        self.allowTiming = True
-
-    def start(self, name):
-        '''Start the measurement'''
-        if self.allowTiming:
-            self.currentName = name
-            self.current = [time.perf_counter()]
-    
-    def pause(self):
-        '''Pause the measurement'''
-        if self.allowTiming:
-            self.gap = [time.perf_counter()]
-    
-    def resume(self):
-        '''Resume timing of the measurement'''
-        if self.allowTiming:
-            self.gap.append(time.perf_counter())
-            self.subtract += self.gap[1] - self.gap[0]
-    
-    def end(self):
-        '''End the measurement and save it'''
-        if self.allowTiming:
-            self.current.append(time.perf_counter())
-            total = self.current[1] - self.current[0] - self.subtract
-            if not self.currentName in self.measurements:
-                self.measurements[self.currentName] = [total]
-            else:
-                self.measurements[self.currentName].append(total)
-            self.subtract = 0
-    
-    def show(self):
-        '''Prints out all measurements taken'''
-        if self.allowTiming:
-            with open(self.logfile, 'w+') as l:
-                for measurement, times in self.measurements.items():
-                    if len(times) > 1:
-                        avg = sum([x for x in times]) / len(times)
-                        l.write(f'{measurement}\n')
-                        l.write(f'  Averg: {avg} (sec)\n')
-                        l.write(f'  Loops: {len(times)}\n')
-                        l.write(f'  FPS:   {1/avg}\n')
-                    else:
-                        l.write(f'{measurement}\n')
-                        l.write(f'  Time: {times[0]} (sec)\n')
-                        l.write(f'  FPS:  {1/times[0]}\n')
+        self.queue = queue.Queue()
+        '''Records (file, text) waiting to be written'''
+        self.thread = threading.Thread(target=self.drain, name='LogWriter',
+                                       daemon=True)
+        '''Background thread writing the records'''
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def write(self, path, text):
+        '''Queues text to be appended to a file'''
+        self.queue.put((path, text))
+
+    def drain(self):
+        '''Thread loop, waits for records and writes them in bulk'''
+        while True:
+            records = [self.queue.get()]
+            try:
+                while True:
+                    records.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                self.writeRecords(records)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                for _ in records:
+                    self.queue.task_done()
+
+    def writeRecords(self, records):
+        '''Appends records to their files, one write per file'''
+        files = {}
+        for path, text in records:
+            files.setdefault(path, []).append(text)
+        for path, texts in files.items():
+            with open(path, 'a+') as l:
+                l.write(''.join(texts))
+
+    def flush(self):
+        '''Blocks until every queued record has been written'''
+        self.queue.join()
 
 class Logger:
     '''
     Singleton class to log all information to the same location
+
+    Messages can take %-style arguments, they are only formatted if the
+    message level is enabled
     '''
     _instance = None
 
@@ -83,18 +94,49 @@ class Logger:
 
     def init(self):
         '''
-        Clear the log file
+        Clear the log file, only the main process owns it
         '''
         self.debugOn = True
-        if self.debugOn:
-            self.logfile = 'log.log'
+        '''Turns all logging on or off'''
+        self.level = LogLevel.DEBUG
+        '''Messages below this level are dropped'''
+        self.Writer = LogWriter()
+        '''Background writer for the log file'''
+        self.logfile = 'log.log'
+        '''File the messages are appended to'''
+        if self.debugOn and multiprocessing.parent_process() is None:
             with open(self.logfile, 'w+') as l:
                 l.write('')
 
-    def log(self, msg):
+    def __deepcopy__(self, memo):
+        '''
+        Copies of objects holding the logger share the same logger
+        '''
+        return self
+
+    def __reduce__(self):
+        '''
+        Unpickled objects use the logger of their own process
+        '''
+        return (Logger, ())
+
+    def enabled(self, level=LogLevel.DEBUG):
+        '''
+        Returns if a message of this level would be logged
+        '''
+        return self.debugOn and level >= self.level
+
+    def log(self, msg, *args, level=LogLevel.DEBUG):
         '''
         Log a message
         '''
-        if self.debugOn:
-            with open(self.logfile, 'a+') as l:
-                l.write(f'{msg}\n')
\ No newline at end of file
+        if self.debugOn and level >= self.level:
+            if args:
+                msg = msg % args
+            self.Writer.write(self.logfile, f'{msg}\n')
+
+    def flush(self):
+        '''
+        Blocks until every logged message has been written
+        '''
+        self.Writer.flush()
@@ -1,7 +1,9 @@
-import curses
 import argparse
-from game import Game
+import sys
+import seedbank
+from game import Game, MAP_HEIGHT, MAP_WIDTH, TOTAL_LEVELS, MONSTER_CHANCE
 from environment import Environment
+from logger import Logger, LogLevel
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Simple Roguelike Training')
@@ -12,11 +14,63 @@ if __name__ == '__main__':
     parser.add_argument('-d', '--display', action='store_true',
                                 help='Turn the display on in the environment')
     parser.add_argument('-t', '--timing', action='store_true',
-                                help='Turn on timing measurements')
+                                help='Turn on timing measurements (written to time.json)')
+    parser.add_argument('-p', '--profile', action='store_true',
+                                help='Sample turns, writes profile.folded and '
+                                     'profile_turns.log')
+    parser.add_argument('-l', '--loglevel', default='DEBUG',
+                                choices=[l.name for l in LogLevel],
+                                help='Lowest level of messages to log')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                                help='Generate all levels at setup with this '
+                                     'many processes')
+    parser.add_argument('--seedbank',
+                                help='Seed bank file to set up games from')
+    parser.add_argument('--build-seedbank', type=int, metavar='SEEDS',
+                                help='Write this many seeds (from --seed or 0) '
+                                     'to the --seedbank file and exit')
+    parser.add_argument('-b', '--benchmark', action='store_true',
+                                help='Run the headless benchmark suite')
+    parser.add_argument('--output', default='benchmark.json',
+                                help='Where to write benchmark results')
+    parser.add_argument('--baseline',
+                                help='Benchmark results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                                help='Allowed slowdown against the baseline '
+                                     '(fraction)')
     args = parser.parse_args()
+    Logger().level = LogLevel[args.loglevel]
 
-    if args.environment:
-        e = Environment(seed=args.seed, display=args.display)
+    bank = None
+    if args.build_seedbank:
+        if not args.seedbank:
+            parser.error('--build-seedbank needs a --seedbank file')
+        first = args.seed if args.seed is not None else 0
+        seedbank.buildSeedBank(args.seedbank,
+                               range(first, first+args.build_seedbank),
+                               MAP_HEIGHT, MAP_WIDTH, TOTAL_LEVELS,
+                               monsterChance=MONSTER_CHANCE,
+                               workers=args.workers)
+        sys.exit(0)
+    elif args.seedbank:
+        bank = seedbank.SeedBank(args.seedbank)
+
+    if args.benchmark:
+        # the benchmark compares against the curses engine
+        import benchmark
+        results = benchmark.runSuite(
+            seed=args.seed if args.seed is not None else 1,
+            output=args.output)
+        if args.baseline and benchmark.compareBaseline(
+                results, args.baseline, args.threshold):
+            sys.exit(1)
+    elif args.environment:
+        e = Environment(seed=args.seed, display=args.display,
+                        profile=args.profile, seedBank=bank)
     else:
-        g = Game(specificSeed=args.seed, timing=args.timing)
+        g = Game(specificSeed=args.seed, timing=args.timing,
+                 profile=args.profile)
+        g.generationWorkers = args.workers
+        g.SeedBank = bank
+        import curses
         curses.wrapper(g.start)
\ No newline at end of file
@@ -13,6 +13,12 @@ class Messager:
             obj._instance.clear()
         return obj._instance
     
+    def __reduce__(self):
+        '''
+        Unpickled objects use the msg queue of their own process
+        '''
+        return (Messager, ())
+
     def clear(self):
         '''
         Clears the msg queue
@@ -96,7 +102,7 @@ class Menu:
             for c,ch in enumerate(self.text):
                 rw = self.origin[0]
                 cl = c+self.origin[1]
-                screenBuffer[rw][cl] = ch
+                screenBuffer.setGlyph(rw, cl, ch)
             self.textSave = self.text
 
 class TurnMenu(Menu):
@@ -7,6 +7,8 @@ class Jelly(Entity):
     '''
     Jelly entity
     '''
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name='Jelly',
                          glyph='j',
@@ -24,23 +26,17 @@ class Jelly(Entity):
         '''
         self.Messager.addMessage('It explodes!')
         # queue animation
-        frames = {}
-        frames['0'] = [
-            ['','' ,''],
-            ['','*',''],
-            ['','' ,'']
-        ]
-        frames['1'] = [
-            ['/' ,'-', '\\'],
-            ['|',' ' ,'|'],
-            ['\\' ,'-', '/']
-        ]
-        apos = [0,0]
-        apos[0] = self.pos[0]-1
-        apos[1] = self.pos[1]-1
-        animation = Animation(apos, frames, Colors().blue)
         animator = Animator()
-        animator.queueUp(animation)
+        if animator.enabled:
+            frames = [
+                [(0,0,'*')],
+                [(-1,-1,'/'), (-1,0,'-'), (-1,1,'\\'),
+                 (0,-1,'|'),  (0,0,' '),  (0,1,'|'),
+                 (1,-1,'\\'), (1,0,'-'),  (1,1,'/')]
+            ]
+            apos = [self.pos[0], self.pos[1]]
+            animation = Animation(apos, frames, Colors().blue)
+            animator.queueUp(animation)
         # spread damage
         entities = []
         points = getOneLayerPts(self.pos)
@@ -63,6 +59,8 @@ class Newt(Entity):
     '''
     Newt Entity
     '''
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name='Newt',
                          glyph='n',
@@ -17,6 +17,10 @@ class FOVMemory(Enum):
     EVERYTHING = 2
 
 class Player(Entity):
+    __slots__ = ('mentalMap', 'fovPoints', 'fovMemory', 'sightRange',
+                 'unknownGlyph', 'unknownColor', 'blockingLayer', 'fovDirty',
+                 'lastFOV')
+
     def __init__(self, rows, cols):
         super().__init__(name='Player',
                          glyph='@',
@@ -47,12 +51,16 @@ class Player(Entity):
         '''Player brain for game interactions'''
         self.Charge = Charge()
         '''Player can run'''
+        self.fovDirty = set()
+        '''Mental map cells that changed since they were last drawn'''
+        self.lastFOV = set()
+        '''Points seen (in FOV or lit) on the previous FOV update'''
 
     def input(self, energy, entityLayer, playerPos, playerZ, event):
         '''
         Receives the player event and uses it
         '''
-        self.Logger.log(f'Player event: {event}')
+        self.Logger.log('Player event: %s', event)
         return self.doAction(event, entityLayer)
 
     def setupFOV(self, entityLayer, lightLayer):
@@ -84,15 +92,27 @@ class Player(Entity):
                                 self.mentalMap[r][c].append(entity)
 
         # add light layer to FOV
+        seen = set(pts)
         for r,row in enumerate(lightLayer):
             for c,col in enumerate(row):
                 if col:
                     self.mentalMap[r][c] = entityLayer[r][c]
+                    seen.add((r,c))
+        # points entering or leaving sight change the mental map
+        self.fovDirty |= seen | self.lastFOV
+        self.lastFOV = seen
+
+    def takeFOVDirtyCells(self):
+        '''Returns the mental map cells changed since the last call'''
+        cells = self.fovDirty
+        self.fovDirty = set()
+        return cells
 
     def clearMentalMap(self, entityLayer):
         '''Clears the mental map'''
         self.mentalMap = [[[] for _ in range(len(entityLayer[row]))]
                                 for row in range(len(entityLayer))]
+        self.lastFOV = set()
 
     def getSimpleFOV(self):
         '''Use a one layer circle to get which points are visible'''
@@ -0,0 +1,242 @@
+import time
+import math
+import json
+import os
+import sys
+import threading
+
+class Histogram:
+    '''
+    Log scaled histogram of durations, used for percentiles
+
+    Bucket i holds durations up to 2^((i+1)/BUCKETS_PER_DOUBLING) nanoseconds
+    so percentiles are accurate to about 9 percent with a fixed memory cost
+    '''
+    BUCKETS_PER_DOUBLING = 8
+
+    def __init__(self):
+        self.buckets = {}
+        '''count of durations in each bucket'''
+        self.count = 0
+        '''total durations added'''
+
+    def add(self, seconds):
+        '''Adds a duration'''
+        ns = seconds * 1e9
+        idx = int(math.log2(ns) * self.BUCKETS_PER_DOUBLING) if ns > 1 else 0
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+        self.count += 1
+
+    def percentile(self, p):
+        '''Returns the duration (seconds) below which p percent fall'''
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen >= target:
+                break
+        return 2 ** ((idx+1) / self.BUCKETS_PER_DOUBLING) / 1e9
+
+class SpanStats:
+    '''Measurements of one span path'''
+    def __init__(self):
+        self.count = 0
+        '''times the span was entered'''
+        self.total = 0.0
+        '''total time (seconds) including child spans'''
+        self.self = 0.0
+        '''time (seconds) not spent in child spans'''
+        self.Histogram = Histogram()
+        '''distribution of total time per call'''
+
+    def report(self):
+        '''Returns the measurements as a dictionary'''
+        return {
+            'count': self.count,
+            'total': self.total,
+            'self': self.self,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.Histogram.percentile(50),
+            'p95': self.Histogram.percentile(95),
+            'p99': self.Histogram.percentile(99)
+        }
+
+class Profiler:
+    '''
+    Singleton hierarchical span profiler
+
+    Spans are started and ended in a stack, each span is recorded under the
+    path of its parents ('Game Loop/Entity Update/FOV'). When disabled start
+    and end return immediately. Only the thread that created the profiler is
+    measured, spans started by worker threads are ignored.
+    '''
+    _instance = None
+
+    def __new__(obj):
+        if not obj._instance:
+            obj._instance = super(Profiler, obj).__new__(obj)
+            obj._instance.init()
+        return obj._instance
+
+    def init(self):
+        self.enabled = False
+        '''spans are only measured if true'''
+        self.logfile = 'time.json'
+        '''where the report is written'''
+        self.threadId = threading.get_ident()
+        '''thread being measured'''
+        self.reset()
+
+    def __deepcopy__(self, memo):
+        '''Copies of objects holding the profiler share the same profiler'''
+        return self
+
+    def __reduce__(self):
+        '''Unpickled objects use the profiler of their own process'''
+        return (Profiler, ())
+
+    def reset(self):
+        '''Drops all measurements'''
+        self.spans = {}
+        '''SpanStats of each span path'''
+        self.stack = []
+        '''open spans as [path, start time, time spent in children]'''
+
+    def start(self, name):
+        '''Start a span inside the currently open span'''
+        if not self.enabled or threading.get_ident() != self.threadId:
+            return
+        if self.stack:
+            name = f'{self.stack[-1][0]}/{name}'
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def end(self):
+        '''End the most recently started span and save it'''
+        if (not self.enabled or not self.stack or
+            threading.get_ident() != self.threadId):
+            return
+        path, start, children = self.stack.pop()
+        total = time.perf_counter() - start
+        if self.stack:
+            self.stack[-1][2] += total
+        stats = self.spans.get(path)
+        if stats is None:
+            stats = self.spans[path] = SpanStats()
+        stats.count += 1
+        stats.total += total
+        stats.self += total - children
+        stats.Histogram.add(total)
+
+    def report(self):
+        '''Returns the measurements of every span path'''
+        return {path: stats.report() for path, stats in self.spans.items()}
+
+    def show(self):
+        '''Writes all measurements taken to the log file as JSON'''
+        if self.enabled:
+            with open(self.logfile, 'w+') as l:
+                json.dump(self.report(), l, indent=2)
+
+class StackSampler:
+    '''
+    Sampling profiler for the thread that created it
+
+    A background thread wakes up every interval and records the call stack
+    of the profiled thread, but only while a turn is being tracked. Stacks
+    are cut at the outermost root function (the game loop or environment
+    step) so terminal I/O and sleeps outside of it are never measured.
+    '''
+    def __init__(self, roots: list, interval=0.005,
+                 stackfile='profile.folded', turnfile='profile_turns.log'):
+        self.roots = set(root.__code__ for root in roots)
+        '''code objects stacks are cut at'''
+        self.interval = interval
+        '''seconds between samples'''
+        self.stackfile = stackfile
+        '''where collapsed stacks are written'''
+        self.turnfile = turnfile
+        '''where the per turn breakdown is written'''
+        self.threadId = threading.get_ident()
+        '''thread being profiled'''
+        self.stacks = {}
+        '''sample count of each collapsed stack'''
+        self.turns = {}
+        '''sample count of each leaf function for each turn'''
+        self.turn = 0
+        '''turn currently being tracked'''
+        self.depth = 0
+        '''nested tracking calls, samples are taken above 0'''
+        self.running = False
+        '''keeps the sampling thread alive'''
+        self.thread = None
+        '''background sampling thread'''
+
+    def addRoot(self, root):
+        '''Also cut stacks at another function'''
+        self.roots.add(root.__code__)
+
+    def start(self):
+        '''Starts the sampling thread'''
+        self.running = True
+        self.thread = threading.Thread(target=self.sample, name='StackSampler',
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''Stops the sampling thread'''
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def beginTurn(self, turn):
+        '''Start sampling a turn, nested calls keep the outer turn'''
+        if self.depth == 0:
+            self.turn = turn
+        self.depth += 1
+
+    def endTurn(self):
+        '''Stop sampling the current turn'''
+        self.depth -= 1
+
+    def sample(self):
+        '''Thread loop, records the profiled thread stack while tracking'''
+        while self.running:
+            time.sleep(self.interval)
+            if self.depth <= 0:
+                continue
+            frame = sys._current_frames().get(self.threadId)
+            names = []
+            cut = -1
+            while frame is not None:
+                code = frame.f_code
+                if code in self.roots:
+                    cut = len(names)
+                names.append(f'{code.co_name} '
+                             f'({os.path.basename(code.co_filename)}:'
+                             f'{code.co_firstlineno})')
+                frame = frame.f_back
+            if cut < 0:
+                continue
+            stack = ';'.join(reversed(names[:cut+1]))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            counts = self.turns.setdefault(self.turn, {})
+            counts[names[0]] = counts.get(names[0], 0) + 1
+
+    def write(self, top=5):
+        '''
+        Writes the collapsed stacks (flamegraph input) and the top leaf
+        functions of every turn
+        '''
+        with open(self.stackfile, 'w+') as l:
+            for stack, count in sorted(self.stacks.items()):
+                l.write(f'{stack} {count}\n')
+        with open(self.turnfile, 'w+') as l:
+            for turn in sorted(self.turns):
+                counts = self.turns[turn]
+                total = sum(counts.values())
+                l.write(f'Turn {turn}: {total} samples\n')
+                ranked = sorted(counts.items(), key=lambda x: -x[1])
+                for name, count in ranked[:top]:
+                    l.write(f'  {count/total:6.1%} {name}\n')
@@ -0,0 +1,124 @@
+from array import array
+
+GLYPH_MASK = 0xFFFF
+'''Low bits of a packed cell hold the glyph index'''
+COLOR_SHIFT = 16
+'''High bits of a packed cell hold the color index'''
+
+class Palette:
+    '''
+    Lookup tables between glyphs/colors and the indices packed in a cell
+
+    Entries are only ever appended so an index stays valid for the lifetime
+    of the palette
+    '''
+    def __init__(self):
+        self.glyphs = []
+        '''glyph for each glyph index'''
+        self.colors = []
+        '''color for each color index'''
+        self.glyphIds = {}
+        '''glyph index for each glyph'''
+        self.colorIds = {}
+        '''color index for each color'''
+
+    def glyphIndex(self, glyph):
+        '''Returns the index of a glyph, adding it if it is new'''
+        idx = self.glyphIds.get(glyph)
+        if idx is None:
+            idx = len(self.glyphs)
+            self.glyphs.append(glyph)
+            self.glyphIds[glyph] = idx
+        return idx
+
+    def colorIndex(self, color):
+        '''Returns the index of a color, adding it if it is new'''
+        idx = self.colorIds.get(color)
+        if idx is None:
+            idx = len(self.colors)
+            self.colors.append(color)
+            self.colorIds[color] = idx
+        return idx
+
+class Screen:
+    '''
+    Packed 2D screen buffer, one unsigned 32 bit cell per screen position
+
+    Each cell holds glyph index | color index << 16, both looked up in the
+    palette. Snapshots are plain array copies and two frames are compared
+    row by row with array slices.
+    '''
+    def __init__(self, rows, cols, glyph=' ', color=None):
+        self.rows = rows
+        '''Total height of the buffer'''
+        self.cols = cols
+        '''Total width of the buffer'''
+        self.Palette = Palette()
+        '''Glyph and color tables for the packed cells'''
+        self.blank = self.pack(glyph, color)
+        '''Packed value of an empty cell'''
+        self.data = array('I', [self.blank]) * (rows*cols)
+        '''Packed cells (row major)'''
+
+    def pack(self, glyph, color):
+        '''Returns the packed value of a glyph and color'''
+        return (self.Palette.glyphIndex(glyph) |
+                self.Palette.colorIndex(color) << COLOR_SHIFT)
+
+    def inBounds(self, r, c):
+        '''Checks if a position is valid within the buffer'''
+        return 0 <= r < self.rows and 0 <= c < self.cols
+
+    def set(self, r, c, glyph, color):
+        '''Sets the glyph and color of a cell'''
+        self.data[r*self.cols+c] = self.pack(glyph, color)
+
+    def setGlyph(self, r, c, glyph):
+        '''Sets the glyph of a cell, keeping its color'''
+        i = r*self.cols+c
+        self.data[i] = ((self.data[i] & ~GLYPH_MASK) |
+                        self.Palette.glyphIndex(glyph))
+
+    def setColor(self, r, c, color):
+        '''Sets the color of a cell, keeping its glyph'''
+        i = r*self.cols+c
+        self.data[i] = ((self.data[i] & GLYPH_MASK) |
+                        self.Palette.colorIndex(color) << COLOR_SHIFT)
+
+    def glyph(self, r, c):
+        '''Returns the glyph of a cell'''
+        return self.Palette.glyphs[self.data[r*self.cols+c] & GLYPH_MASK]
+
+    def color(self, r, c):
+        '''Returns the color of a cell'''
+        return self.Palette.colors[self.data[r*self.cols+c] >> COLOR_SHIFT]
+
+    def clear(self):
+        '''Resets every cell to the blank value'''
+        self.data[:] = array('I', [self.blank]) * (self.rows*self.cols)
+
+    def snapshot(self):
+        '''Returns a copy of the packed cells'''
+        return self.data[:]
+
+    def restore(self, snapshot):
+        '''Overwrites the packed cells with a snapshot'''
+        self.data[:] = snapshot
+
+    def changedRows(self, other):
+        '''
+        Returns the rows that differ from another packed buffer of the same
+        size, every row if the sizes differ
+        '''
+        if len(other) != len(self.data):
+            return list(range(self.rows))
+        data = self.data
+        cols = self.cols
+        return [r for r in range(self.rows)
+                    if data[r*cols:(r+1)*cols] != other[r*cols:(r+1)*cols]]
+
+    def rowText(self, r):
+        '''Returns the glyphs of a row as a string'''
+        glyphs = self.Palette.glyphs
+        return ''.join([glyphs[v & GLYPH_MASK]
+                        for v in self.data[r*self.cols:(r+1)*self.cols]])
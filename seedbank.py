@@ -0,0 +1,147 @@
+import itertools
+import mmap
+import pickle
+import secrets
+import struct
+from colors import Colors
+from entity import Entity
+from level import LevelManager, GENERATOR_VERSION, generationPool
+from logger import Logger
+
+MAGIC = b'RLSEEDBK'
+'''Marks a seed bank file'''
+HEADER = struct.Struct('<8sQ')
+'''File header: magic and offset of the index'''
+
+def bankKey(height, width, levels, monsterChance, startPos):
+    '''
+    Returns the key of the levels a seed bank holds, levels from a bank are
+    only used by a game with the same key
+    '''
+    return (height, width, levels, monsterChance, tuple(startPos),
+            GENERATOR_VERSION)
+
+def buildSeedBank(path, seeds, height, width, levels, monsterChance=3,
+                  startPos=[1,1], workers=0):
+    '''
+    Generates every level of each seed and writes them to a seed bank file
+
+    The file holds every level pickled on its own followed by the index
+    (bank key, display colors, highest entity id and the location of the
+    levels of every seed)
+
+    Colors are set up without curses unless the caller already set them up
+    '''
+    Colors(display=False)
+    index = {}
+    lastId = 0
+    # one pool of workers builds the levels of every seed
+    pool = generationPool(workers) if workers > 0 else None
+    try:
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0))
+            for seed in seeds:
+                lm = LevelManager(None, seed, height=height, width=width,
+                                  levels=levels, monsterChance=monsterChance,
+                                  pool=pool)
+                lm.defaultLevelSetupWalls(list(startPos))
+                for z in range(levels):
+                    lm.generateLevel(z)
+                index[seed] = []
+                for level in lm.Levels:
+                    data = pickle.dumps(level,
+                                        protocol=pickle.HIGHEST_PROTOCOL)
+                    index[seed].append((f.tell(), len(data)))
+                    f.write(data)
+                    lastId = max([lastId] + [e.id for row in level.EntityLayer
+                                             for cell in row for e in cell])
+            indexOffset = f.tell()
+            pickle.dump({'key': bankKey(height, width, levels, monsterChance,
+                                        startPos),
+                         'colors': vars(Colors()),
+                         'lastId': lastId,
+                         'seeds': index},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, indexOffset))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+class SeedBank:
+    '''
+    Pre-generated levels of many seeds, read from a memory mapped file
+
+    Only the index is read when opening, a level is unpickled straight from
+    the mapped file when it is first entered
+    '''
+    def __init__(self, path):
+        self.path = path
+        '''Seed bank file'''
+        self.Logger = Logger()
+        with open(path, 'rb') as f:
+            self.Map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            '''Memory mapped seed bank file'''
+        magic, indexOffset = HEADER.unpack_from(self.Map)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a seed bank')
+        index = pickle.loads(self.Map[indexOffset:])
+        self.key = index['key']
+        '''Settings and generator version the levels were built with'''
+        self.Seeds = index['seeds']
+        '''File location (offset, length) of each level of every seed'''
+        self.seedList = list(self.Seeds)
+        '''Seeds in the bank, to pick from'''
+        self.colors = index['colors']
+        '''Display colors of the building process, entities loaded in a
+        process with other colors (curses or not) get the local ones'''
+        # entities of this process get ids above the ids stored in the bank,
+        # the stored entities keep theirs (each game only holds one seed)
+        if next(Entity._id_gen) <= index['lastId']:
+            Entity._id_gen = itertools.count(index['lastId'] + 1)
+
+    def matches(self, height, width, levels, monsterChance, startPos):
+        '''
+        Returns if the bank holds levels for these game settings
+        '''
+        return self.key == bankKey(height, width, levels, monsterChance,
+                                   startPos)
+
+    def randomSeed(self):
+        '''
+        Returns a random seed from the bank
+        '''
+        return secrets.choice(self.seedList)
+
+    def hasSeed(self, seed):
+        '''
+        Returns if the levels of a seed are in the bank
+        '''
+        return seed in self.Seeds
+
+    def level(self, seed, z):
+        '''
+        Returns a fresh copy of a level of a seed in the bank
+        '''
+        offset, length = self.Seeds[seed][z]
+        with memoryview(self.Map) as view:
+            level = pickle.loads(view[offset:offset+length])
+        colors = Colors()
+        colorMap = {value: getattr(colors, name)
+                    for name, value in self.colors.items()
+                    if not name.startswith('_') and value != getattr(colors, name)}
+        if colorMap:
+            for row in level.EntityLayer:
+                for cell in row:
+                    for entity in cell:
+                        if entity.id > 0:
+                            entity.color = colorMap.get(entity.color,
+                                                        entity.color)
+        self.Logger.log('Level %s of seed %s loaded from the seed bank', z, seed)
+        return level
+
+    def close(self):
+        '''
+        Unmaps the seed bank file
+        '''
+        self.Map.close()
@@ -0,0 +1,179 @@
+import os
+import random
+import tempfile
+from game import Game
+from level import LevelManager
+from seedbank import SeedBank, buildSeedBank
+from component import ONE_LAYER_CIRCLE
+from algo import astar
+
+SEEDS = range(5)
+'''Seeds played by every check'''
+SIZE = (20, 40)
+'''Map size (rows, cols) of the checked games'''
+
+def headlessGame(seed, size=SIZE, density=3):
+    '''
+    Returns a headless game set up for a map size and monster density
+    '''
+    game = Game(specificSeed=seed, display=False)
+    game.Logger.debugOn = False
+    game.mapHeight, game.mapWidth = size
+    game.monsterChance = density
+    game.noDisplaySetup()
+    return game
+
+def levelSnapshot(level):
+    '''
+    Returns what generation decides on a level (entities of every cell,
+    terrain and up stairs) in a comparable form
+    '''
+    cells = [[[(e.name, e.layer) for e in cell] for cell in row]
+             for row in level.EntityLayer]
+    return cells, [bytes(row) for row in level.Terrain], level.upstairPos
+
+def freshLevels(game):
+    '''
+    Returns every level of the game's seed generated by a new level manager
+    without any player
+    '''
+    manager = LevelManager(None, game.seed, height=game.mapHeight,
+                           width=game.mapWidth, levels=game.totalLevels,
+                           monsterChance=game.monsterChance)
+    manager.defaultLevelSetupWalls([1,1])
+    return [manager.generateLevel(z) for z in range(game.totalLevels)]
+
+def playClimbing(game, turns=400, beforeClimb=None):
+    '''
+    Plays a set up game walking the player to the up stairs of every level
+    and climbing them, monsters in the way are attacked
+
+    beforeClimb(manager) is called right before each climb. Returns the
+    trace of the player (position, level, health) after every turn
+    '''
+    manager = game.LevelManager
+    trace = []
+    for _ in range(turns):
+        player = manager.Player
+        level = manager.getCurrentLevel()
+        stairs = level.upstairPos
+        if not player.Health.alive or stairs[0] < 0:
+            break
+        if player.pos == stairs:
+            if beforeClimb is not None:
+                beforeClimb(manager)
+            action = '<'
+        else:
+            code, pts = astar(level.EntityLayer.Opaque, tuple(player.pos),
+                              tuple(stairs))
+            if code != 1 or len(pts) < 2:
+                break
+            step = (pts[1][0]-player.pos[0], pts[1][1]-player.pos[1])
+            action = str(ONE_LAYER_CIRCLE.index(step)+1)
+        game.loop(action, 1)
+        game.messages()
+        player = manager.Player
+        trace.append((tuple(player.pos), player.z, player.Health.currentHealth))
+    return trace
+
+def testLevelOrder(moves=40):
+    '''
+    A level generated after the player walked around the level below is the
+    same as the level generated by a fresh game
+    '''
+    failed = []
+    for seed in SEEDS:
+        game = headlessGame(seed)
+        game.gameSetup()
+        manager = game.LevelManager
+        manager.prefetchDistance = 0
+        rng = random.Random(seed)
+        for _ in range(moves):
+            if not manager.Player.Health.alive:
+                break
+            game.loop(rng.choice('12346789'), 1)
+            game.messages()
+        fresh = freshLevels(game)
+        if (levelSnapshot(manager.generateLevel(1)) !=
+            levelSnapshot(fresh[1])):
+            failed.append(seed)
+    assert not failed, f'level 1 depends on the player for seeds {failed}'
+
+def testPrefetch():
+    '''
+    Levels generated in the background while the player walks to the up
+    stairs are the same as the levels generated by a fresh game
+    '''
+    failed = []
+    for seed in SEEDS:
+        game = headlessGame(seed)
+        game.gameSetup()
+        prefetched = {}
+        def beforeClimb(manager):
+            if manager.Prefetch is not None:
+                manager.Prefetch.join()
+            z = manager.CurrentZ + 1
+            if manager.Levels[z] is not None:
+                prefetched[z] = levelSnapshot(manager.Levels[z])
+        playClimbing(game, beforeClimb=beforeClimb)
+        fresh = freshLevels(game)
+        if not prefetched or any(snapshot != levelSnapshot(fresh[z])
+                                 for z, snapshot in prefetched.items()):
+            failed.append(seed)
+    assert not failed, f'prefetched levels differ for seeds {failed}'
+
+def testWorkers(workers=2):
+    '''
+    A game with every level generated at setup by worker processes plays the
+    same as a game generating each level when the player climbs to it
+    '''
+    failed = []
+    for seed in SEEDS:
+        runs = []
+        for generationWorkers in (0, workers):
+            game = headlessGame(seed)
+            game.generationWorkers = generationWorkers
+            game.gameSetup()
+            game.LevelManager.prefetchDistance = 0
+            entered = []
+            def beforeClimb(manager):
+                # lazily generated from here, after the player moved
+                level = manager.generateLevel(manager.CurrentZ + 1)
+                entered.append(levelSnapshot(level))
+            trace = playClimbing(game, beforeClimb=beforeClimb)
+            game.end()
+            runs.append((entered, trace))
+        if not runs[0][0] or runs[0] != runs[1]:
+            failed.append(seed)
+    assert not failed, f'levels from workers differ for seeds {failed}'
+
+def testSeedBank():
+    '''
+    A game set up from a seed bank plays the same as a game generating its
+    levels, on runs that climb to every level
+    '''
+    fd, path = tempfile.mkstemp(suffix='.bank')
+    os.close(fd)
+    try:
+        buildSeedBank(path, SEEDS, SIZE[0], SIZE[1], 3)
+        bank = SeedBank(path)
+        failed = []
+        for seed in SEEDS:
+            traces = []
+            for seedBank in (None, bank):
+                game = headlessGame(seed)
+                game.SeedBank = seedBank
+                game.gameSetup()
+                traces.append(playClimbing(game))
+            if traces[0] != traces[1] or not traces[0]:
+                failed.append(seed)
+        bank.close()
+    finally:
+        os.remove(path)
+    assert not failed, f'seed bank games differ for seeds {failed}'
+
+if __name__ == '__main__':
+    testLevelOrder()
+    testPrefetch()
+    testWorkers()
+    testSeedBank()
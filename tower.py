@@ -2,26 +2,70 @@ from entity import *
 from colors import Colors
 from component import *
 
-class Wall(Entity):
-    '''Wall entity'''
-    def __init__(self):
-        super().__init__(name='Wall',
-                         glyph='░',
-                         color=Colors().white,
-                         layer=Layer.WALL_LAYER,
-                         size=Size.VERY_LARGE)
+class Tile:
+    '''
+    Static terrain descriptor (flyweight)
 
-class Floor(Entity):
-    '''Floor entity'''
-    def __init__(self):
-        super().__init__(name='Floor',
-                         glyph='.',
-                         color=Colors().white,
-                         layer=Layer.FLOOR_LAYER,
-                         size=Size.LARGE)
+    A single instance is shared by every cell holding that kind of terrain,
+    it has no position or behavior. Levels also record the tile id of every
+    cell in their terrain grid.
+    '''
+    __slots__ = ('tileId', 'id', 'name', 'glyph', 'colorName', 'layer', 'size',
+                 '_color')
+    Health = Attack = Brain = Charge = Activate = None
+    '''Tiles have no components'''
+    def __init__(self, tileId: int, name: str, glyph: str, colorName: str,
+                 layer: Layer, size: Size):
+        self.tileId = tileId
+        '''Index in TILES, stored in the terrain grid'''
+        self.id = -tileId
+        '''Key in a cell, negative so it never matches an entity id'''
+        self.name = name
+        '''Name of the terrain'''
+        self.glyph = glyph
+        '''Glyph for display'''
+        self.colorName = colorName
+        '''Name of the display color in Colors'''
+        self.layer = layer
+        '''Layer level at which the terrain resides'''
+        self.size = size
+        '''Size enum for the terrain'''
+        self._color = None
+        '''Display color, resolved on the first read'''
+
+    @property
+    def color(self):
+        '''Color for display, looked up the first time it is read so Colors
+        is set up by then (each process resolves its own tiles)'''
+        if self._color is None:
+            self._color = getattr(Colors(), self.colorName)
+        return self._color
+
+    def __deepcopy__(self, memo):
+        '''Copies of a cell share the same tile'''
+        return self
+
+    def __reduce__(self):
+        '''Unpickled cells share the tile of their own process'''
+        return (tileById, (self.tileId,))
+
+NO_TILE = 0
+'''Terrain grid id of a cell without a tile'''
+FLOOR = Tile(1, 'Floor', '.', 'white', Layer.FLOOR_LAYER, Size.LARGE)
+'''Floor tile'''
+WALL = Tile(2, 'Wall', '░', 'white', Layer.WALL_LAYER, Size.VERY_LARGE)
+'''Wall tile'''
+TILES = [None, FLOOR, WALL]
+'''Tiles by tile id'''
+
+def tileById(tileId):
+    '''Returns the shared tile for a tile id'''
+    return TILES[tileId]
 
 class StairUp(Entity):
     '''Up stair entity'''
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name='Upstair',
                          glyph='<',
@@ -31,6 +75,8 @@ class StairUp(Entity):
 
 class StairDown(Entity):
     '''Down stair entity'''
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name='Downstair',
                          glyph='>',
@@ -40,6 +86,8 @@ class StairDown(Entity):
 
 class Light(Entity):
     '''Light entity'''
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name='Light',
                          glyph='+',
@@ -59,6 +107,8 @@ class Light(Entity):
                 lightLayer[pt[0]][pt[1]] = 1
     
 class Dart(Entity):
+    '''Thrown dart entity'''
+    __slots__ = ()
 
     def __init__(self):
         super().__init__(name='Dart',